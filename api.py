@@ -0,0 +1,211 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, jsonify, request, stream_with_context
+from sqlalchemy import func, case
+
+from models import db, Artist, Show, Venue, filter_by_genre, genre_names_by_id, in_batches
+from schedule import filter_shows, show_filters
+from search import search_subquery
+
+# JSON API under /api/v1/.
+#
+# List endpoints stream a JSON array: rows are read from a server-side cursor
+# (yield_per) and written out a batch at a time, so memory stays flat whatever
+# the size of the table. ?fields=id,name selects the fields of each object and
+# the listings take the same filters as the HTML pages (?genre=, ?search_term=,
+# and ?from=&to=&city=&state=&venue_id= for shows).
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+STREAM_BATCH_SIZE = 1000
+
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "city": Venue.city,
+    "state": Venue.state,
+    "address": Venue.address,
+    "phone": Venue.phone,
+    "image_link": Venue.image_link,
+    "facebook_link": Venue.facebook_link,
+    "website": Venue.website_link,
+    "seeking_talent": Venue.searching_talent,
+    "seeking_description": Venue.seeking_description,
+}
+
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "city": Artist.city,
+    "state": Artist.state,
+    "phone": Artist.phone,
+    "image_link": Artist.image_link,
+    "facebook_link": Artist.facebook_link,
+    "website": Artist.website_link,
+    "seeking_venue": Artist.searching_venue,
+    "seeking_description": Artist.seeking_description,
+}
+
+SHOW_FIELDS = {
+    "id": Show.id,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "start_time": Show.start_time,
+    "end_time": Show.end_time,
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default)
+
+
+# the fields asked for with ?fields=a,b (all of them by default), validated
+# before anything is streamed so a bad request still gets a 400
+def _selected_fields(available):
+    fields = request.args.get("fields")
+    if not fields:
+        return list(available)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in available]
+    if unknown:
+        abort(400, description=f"Unknown field(s): {', '.join(unknown)}")
+    return selected
+
+
+def _stream_array(batches):
+    # one chunk per batch of rows rather than one write per row
+    def generate():
+        separator = "["
+        for batch in batches:
+            if batch:
+                yield separator + ",".join(_dumps(item) for item in batch)
+                separator = ","
+        yield "[]\n" if separator == "[" else "]\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def _entity_batches(model, query, fields):
+    for batch in in_batches(query.yield_per(STREAM_BATCH_SIZE), STREAM_BATCH_SIZE):
+        genres = genre_names_by_id(model, [row.id for row in batch]) if "genres" in fields else {}
+        items = []
+        for row in batch:
+            item = {field: getattr(row, field) for field in fields if field != "genres"}
+            if "genres" in fields:
+                item["genres"] = genres.get(row.id, [])
+            items.append(item)
+        yield items
+
+
+def _entity_query(model, available, fields):
+    # the id is always read, genres are looked up by it
+    columns = [model.id.label("id")] + [
+        available[field].label(field) for field in fields if field not in ("id", "genres")
+    ]
+    return db.session.query(*columns)
+
+
+def _list_entities(model, available):
+    fields = _selected_fields(dict(available, genres=None))
+    query = _entity_query(model, available, fields)
+    genre = request.args.get("genre")
+    if genre:
+        query = filter_by_genre(query, model, genre)
+    search_term = request.args.get("search_term")
+    if search_term is not None:
+        # ranked like /venues/search and /artists/search
+        matches = search_subquery(model, search_term)
+        query = query.join(matches, matches.c.id == model.id).order_by(matches.c.rank, model.id)
+    else:
+        query = query.order_by(model.id)
+    return _stream_array(_entity_batches(model, query, fields))
+
+
+def _get_entity(model, available, entity_id):
+    fields = _selected_fields(dict(available, genres=None))
+    query = _entity_query(model, available, fields).filter(model.id == entity_id)
+    items = [item for batch in _entity_batches(model, query, fields) for item in batch]
+    if not items:
+        abort(404)
+    item = items[0]
+    now = datetime.now()
+    foreign_key = Show.venue_id if model is Venue else Show.artist_id
+    counts = (
+        db.session.query(
+            func.count(case((Show.start_time > now, 1))).label("upcoming"),
+            func.count(case((Show.start_time <= now, 1))).label("past"),
+        )
+        .filter(foreign_key == entity_id)
+        .one()
+    )
+    item["upcoming_shows_count"] = counts.upcoming
+    item["past_shows_count"] = counts.past
+    return jsonify(item)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+
+@api.route("/venues")
+def venues():
+    return _list_entities(Venue, VENUE_FIELDS)
+
+
+@api.route("/venues/<int:venue_id>")
+def venue(venue_id):
+    return _get_entity(Venue, VENUE_FIELDS, venue_id)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+@api.route("/artists")
+def artists():
+    return _list_entities(Artist, ARTIST_FIELDS)
+
+
+@api.route("/artists/<int:artist_id>")
+def artist(artist_id):
+    return _get_entity(Artist, ARTIST_FIELDS, artist_id)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+@api.route("/shows")
+def shows():
+    fields = _selected_fields(SHOW_FIELDS)
+    filters = show_filters(request.args)
+    query = (
+        db.session.query(*[SHOW_FIELDS[field].label(field) for field in fields])
+        .select_from(Show)
+        .join(Venue, Venue.id == Show.venue_id)
+        .join(Artist, Artist.id == Show.artist_id)
+    )
+    query = (
+        filter_shows(query, filters)
+        # the order of the (start_time, artist_id, venue_id) index
+        .order_by(Show.start_time, Show.artist_id, Show.venue_id)
+        .yield_per(STREAM_BATCH_SIZE)
+    )
+    batches = ([row._asdict() for row in batch] for batch in in_batches(query, STREAM_BATCH_SIZE))
+    return _stream_array(batches)
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({"error": error.name, "description": error.description}), error.code
@@ -2,11 +2,15 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
+from datetime import date, datetime, timedelta
+import hmac
+import os
+from itertools import groupby
+from functools import lru_cache
 from flask import (
+    Blueprint,
     Flask,
+    current_app,
     render_template,
     request,
     Response,
@@ -14,26 +18,103 @@ from flask import (
     redirect,
     url_for,
     abort,
-    jsonify
+    jsonify,
+    stream_template,
+    stream_with_context
 )
-from flask_moment import Moment
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from models import setup_db, Artist, Venue, Show
-from flask_migrate import Migrate
+from models import db, setup_db, Artist, Venue, Show, Genre, filter_by_genre
+from pagination import paginate
+from search import search_subquery
+from schedule import (
+    CALENDAR_VIEWS, calendar_period, calendar_rows, calendar_weeks, filter_shows, find_conflicts,
+    is_booking_conflict, show_end_time, show_filters,
+)
+from assets import assets
+from cache import response_cache
+from conditional import (
+    conditional, artist_version, artists_version, calendar_version, shows_version,
+    venue_version, venues_version,
+)
+from perf import perf_monitor
+from routing import replica_router
+from api import api
+from commands import fyyur_cli
+import exporter
+from importer import ENTITIES
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import noload, selectinload
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object("config") #configuring our Flask App from a config file
-# print(app.config)
-db = setup_db(app) # initializes our Flask app with db
-migrate = Migrate(app, db)
+main = Blueprint("main", __name__)
+
+
+# This function creates the Flask app: settings from config.py, overridden by
+# `config` (a mapping, an object or an import name) when given. Nothing
+# connects to the database here, engines and pools are created on first use,
+# so an app created before forking (a preloading server) shares no
+# connections with the workers.
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object("config")
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+    setup_db(app)
+    response_cache.init_app(app)
+    perf_monitor.init_app(app)
+    replica_router.init_app(app)
+    assets.init_app(app)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    app.cli.add_command(fyyur_cli)
+    # alembic is only loaded by the flask command (flask db ...), not by
+    # serving processes
+    if os.environ.get("FLASK_RUN_FROM_CLI") == "true":
+        init_migrate(app)
+    if not app.debug:
+        configure_logging(app)
+    return app
+
+
+# This function registers Flask-Migrate, for the `flask db` commands and the
+# flask_migrate functions (upgrade(), ...)
+
+
+def init_migrate(app):
+    from flask_migrate import Migrate
+
+    Migrate(app, db)
+
+
+# This function prepares a new process for its first request: the modules
+# deferred at startup are imported, templates compiled, the datetime patterns
+# parsed and, with `connect`, a connection of each database opened (which also
+# runs the dialect's first-connect setup)
+
+
+def warmup(app, connect=True):
+    import forms  # noqa: F401
+
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+    for format in DATETIME_FORMATS:
+        datetime_pattern(format)
+    datetime_locale()
+    if connect:
+        with app.app_context():
+            for bind in [None, *app.config["SQLALCHEMY_BINDS"]]:
+                with db.get_engine(app, bind=bind).connect() as connection:
+                    connection.execute(text("SELECT 1"))
+
 
 # ----------------------------------------------------------------------------#
 # Models.
@@ -43,21 +124,62 @@ migrate = Migrate(app, db)
 # ----------------------------------------------------------------------------#
 
 
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+DATETIME_LOCALE = "en"
+
+
+# babel is imported with the first date formatted, not at startup; patterns
+# are parsed once per format and reused for every show tile
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+    import babel.dates
+
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=None)
+def datetime_locale():
+    import babel
+
+    return babel.Locale.parse(DATETIME_LOCALE)
+
+
+# show lists repeat the same start times a lot, formatted strings are memoized
+@lru_cache(maxsize=4096)
+def format_datetime_cached(value, format):
+    return datetime_pattern(format).apply(value, datetime_locale())
+
+
 def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale="en")
+    # views pass datetime objects, strings are still accepted
+    if isinstance(value, str):
+        import dateutil.parser
+
+        value = dateutil.parser.parse(value)
+    return format_datetime_cached(value, format)
 
 
-app.jinja_env.filters["datetime"] = format_datetime
+main.add_app_template_filter(format_datetime, "datetime")
 
 # ----------------------------------------------------------------------------#
 # Helper Functions.
 # ----------------------------------------------------------------------------#
 
+def configure_logging(app):
+    file_handler = FileHandler("error.log")
+    file_handler.setFormatter(
+        Formatter(
+            "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info("errors")
+
+
 # This function helps construct error msgs using data from form.errors
 
 
@@ -77,12 +199,39 @@ def error_msg_constructor(error_dict):
     return error_msg
 
 
+# This function splits joined show rows (flagged is_upcoming by the query) into
+# past and upcoming show dicts, keeping the counterpart fields listed in `fields`
+
+
+def split_show_rows(show_rows, fields):
+    past_shows = []
+    upcoming_shows = []
+    for row in show_rows:
+        show_data = {field: getattr(row, field) for field in fields}
+        show_data["start_time"] = row.start_time
+        if row.is_upcoming:
+            upcoming_shows.append(show_data)
+        else:
+            past_shows.append(show_data)
+    return past_shows, upcoming_shows
+
+
+# This function renders a listing page in full, or with STREAM_TEMPLATES
+# streams it: the layout goes out first and the rows as they are fetched
+
+
+def render_listing(template_name, **context):
+    if current_app.config["STREAM_TEMPLATES"]:
+        return stream_template(template_name, **context)
+    return render_template(template_name, **context)
+
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
 
-@app.route("/")
+@main.route("/")
 def index():
     return render_template("pages/home.html")
 
@@ -91,79 +240,96 @@ def index():
 #  ----------------------------------------------------------------
 
 
-@app.route("/venues")
+@main.route("/venues")
+@conditional(venues_version)
+@response_cache.cached("venues", "shows")
 def venues():
-    print("HEREEEEEEEEEEEEEEEEEEEEEE")
-    # num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    distinct_venues = (
-        Venue.query.with_entities(Venue.city, Venue.state)
-        .group_by(Venue.city, Venue.state)
-        .all()
-    )  # returns a list of 2-item tuples
-    for dv in distinct_venues:
-        location_data = {"city": dv[0], "state": dv[1]}
-        venues = Venue.query.filter_by(city=dv[0], state=dv[1]).all()
-        venues_data = []
-        for venue in venues:
-            venue_obj = {
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(
-                    list(
-                        filter(
-                            lambda showRow: showRow.start_time > datetime.now(),
-                            venue.shows,
-                        )  # filters out past shows form venue.shows
-                    )
-                ),
-            }
-            venues_data.append(venue_obj)
+    # num_upcoming_shows is the venue's maintained counter (see counters.py)
+    venues_query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    )
+    genre = request.args.get("genre")
+    if genre:
+        venues_query = filter_by_genre(venues_query, Venue, genre)
+    # keyed on (city, state, id) so that each page stays grouped by area
+    page = paginate(
+        venues_query, [Venue.city, Venue.state, Venue.id], lazy=current_app.config["STREAM_TEMPLATES"]
+    )
 
-        location_data["venues"] = venues_data
-        data.append(location_data)
+    # rows are ordered by (city, state) so each area is built in a single pass,
+    # lazily, as the template walks the areas
+    data = (
+        {
+            "city": city,
+            "state": state,
+            "venues": (
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "num_upcoming_shows": row.num_upcoming_shows,
+                }
+                for row in rows
+            ),
+        }
+        for (city, state), rows in groupby(page.items, key=lambda row: (row.city, row.state))
+    )
 
-    return render_template("pages/venues.html", areas=data)
+    return render_listing("pages/venues.html", areas=data, page=page, genre=genre)
 
 
-@app.route("/venues/search", methods=["POST"])
+@main.route("/venues/search", methods=["GET", "POST"])
 def search_venues():
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    search_query = request.form.get("search_term", "")
-    search_results = Venue.query.filter(
-        Venue.name.ilike("%{}%".format(search_query))).all()  # Queries row(s) from venues table with name fully or partially matching search_query
+    # the form POSTs the first page, next/prev links GET the following ones
+    search_query = request.values.get("search_term", "")
+    # ranked matches on name, city, state and genres from the search index
+    matches = search_subquery(Venue, search_query)
+    results_query = db.session.query(
+        Venue.id,
+        Venue.name,
+        matches.c.rank,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    ).join(matches, matches.c.id == Venue.id)
+    page = paginate(
+        results_query, [matches.c.rank, Venue.id], url_args={"search_term": search_query}
+    )
     response = {
-        "count": len(search_results)
+        "count": db.session.query(func.count()).select_from(matches).scalar(),
+        "data": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "num_upcoming_shows": row.num_upcoming_shows,
+            }
+            for row in page.items
+        ],
     }
-    data = []
-    for result in search_results:
-        result_data = {
-            "id": result.id,
-            "name": result.name,
-            # filters out past shows form venue.shows
-            "num_upcoming_shows": len(list(filter(lambda show: show.start_time > datetime.now(), result.shows))),
-        }
-        data.append(result_data)
-    response["data"] = data
     return render_template(
         "pages/search_venues.html",
         results=response,
-        search_term=request.form.get("search_term", ""),
+        search_term=search_query,
+        page=page,
     )
 
 
-@app.route("/venues/<int:venue_id>")
+@main.route("/venues/<int:venue_id>")
+@conditional(venue_version)
+@response_cache.cached("venue:{venue_id}", "artists")
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    venue = Venue.query.get(venue_id)
+    venue = Venue.query.options(noload(Venue.shows), selectinload(Venue.genres)).get(venue_id)
     if venue == None:
         abort(404)
 
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": venue.genres.split(", "),
+        "genres": [genre.name for genre in venue.genres],
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -175,37 +341,26 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
     }
 
-    # GETTING PAST SHOWS FOR THE CURRENT VENUE
-    past_shows_results = filter(
-        lambda show: show.start_time < datetime.now(), venue.shows
+    # GETTING PAST AND UPCOMING SHOWS FOR THE CURRENT VENUE
+    # one query joins the venue's shows to their artists, ordered by start_time
+    show_rows = (
+        db.session.query(
+            Show.start_time,
+            Artist.id.label("artist_id"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+            (Show.start_time > datetime.now()).label("is_upcoming"),
+        )
+        .join(Artist, Artist.id == Show.artist_id)
+        .filter(Show.venue_id == venue_id)
+        .order_by(Show.start_time)
+        .all()
+    )
+    past_shows, upcoming_shows = split_show_rows(
+        show_rows, ("artist_id", "artist_name", "artist_image_link")
     )
-    past_shows = []
-    for past_show in past_shows_results:
-        artist = Artist.query.get(past_show.artist_id)
-        past_show_data = {
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(past_show.start_time),
-        }
-        past_shows.append(past_show_data)
     data["past_shows"] = past_shows
     data["past_shows_count"] = len(past_shows)
-
-    # GETTING UPCOMING SHOWS FOR THE CURRENT VENUE
-    upcoming_shows_results = filter(
-        lambda show: show.start_time > datetime.now(), venue.shows
-    )
-    upcoming_shows = []
-    for up_show in upcoming_shows_results:
-        artist = Artist.query.get(up_show.artist_id)
-        up_show_data = {
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(up_show.start_time),
-        }
-        upcoming_shows.append(up_show_data)
     data["upcoming_shows"] = upcoming_shows
     data["upcoming_shows_count"] = len(upcoming_shows)
     return render_template("pages/show_venue.html", venue=data)
@@ -215,14 +370,18 @@ def show_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route("/venues/create", methods=["GET"])
+@main.route("/venues/create", methods=["GET"])
 def create_venue_form():
+    from forms import VenueForm
+
     form = VenueForm()
     return render_template("forms/new_venue.html", form=form)
 
 
-@app.route("/venues/create", methods=["POST"])
+@main.route("/venues/create", methods=["POST"])
 def create_venue_submission():
+    from forms import VenueForm
+
     form = VenueForm(request.form)
     if form.validate():
         error = False
@@ -234,7 +393,7 @@ def create_venue_submission():
             phone = form.phone.data
             image_link = form.image_link.data
             facebook_link = form.facebook_link.data
-            genres = ", ".join(form.genres.data)
+            genres = Genre.from_names(form.genres.data)
             website_link = form.website_link.data
             searching_talent = form.seeking_talent.data
             seeking_description = form.seeking_description.data
@@ -266,9 +425,10 @@ def create_venue_submission():
             abort(500)
         else:
             # on successful db insert, flash success
+            response_cache.invalidate("venues")
             flash(
                 f"Venue, \"{request.form['name']}\" was successfully listed!")
-            return redirect(url_for("venues"))
+            return redirect(url_for("main.venues"))
             # return render_template('pages/home.html')
     else:
         error_msg = error_msg_constructor(form.errors)
@@ -277,14 +437,15 @@ def create_venue_submission():
         return render_template("forms/new_venue.html", form=form)
 
 
-@app.route("/venues/<int:venue_id>", methods=["POST"])
+@main.route("/venues/<int:venue_id>", methods=["POST"])
 def delete_venue(venue_id):
     error = None
     confirm_delete = request.get_json().get("confirmDelete", None)
     if confirm_delete:
         try:
-            venue = Venue.query.get(venue_id)
-            print(venue) 
+            venue = Venue.query.options(
+                selectinload(Venue.shows), selectinload(Venue.genres)
+            ).get(venue_id)
             db.session.delete(venue)
             db.session.commit()
         except:
@@ -297,6 +458,7 @@ def delete_venue(venue_id):
                 f"An error occured. Venue, \"{venue.name}\" could not be deleted", 'error')
             abort(500)
         else:
+            response_cache.invalidate("venues", f"venue:{venue_id}", "shows")
             flash(f"Venue, \"{venue.name}\" was successfully deleted.")
             return jsonify({"redirect":True})
     else:
@@ -307,58 +469,71 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route("/artists")
+@main.route("/artists")
+@conditional(artists_version)
+@response_cache.cached("artists")
 def artists():
-    artists = Artist.query.all()
-    data = []
-    for artist in artists:
-        artist_data = {
-            "id": artist.id,
-            "name": artist.name,
-        }
-        data.append(artist_data)
-    data.reverse()
-    return render_template("pages/artists.html", artists=data)
+    # newest artists first, only the columns the listing needs
+    artists_query = db.session.query(Artist.id, Artist.name)
+    genre = request.args.get("genre")
+    if genre:
+        artists_query = filter_by_genre(artists_query, Artist, genre)
+    page = paginate(
+        artists_query, [Artist.id], descending=True, lazy=current_app.config["STREAM_TEMPLATES"]
+    )
+    data = ({"id": artist.id, "name": artist.name} for artist in page.items)
+    return render_listing("pages/artists.html", artists=data, page=page, genre=genre)
 
 
-@app.route("/artists/search", methods=["POST"])
+@main.route("/artists/search", methods=["GET", "POST"])
 def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
-    search_query = request.form.get("search_term", "")
-    search_results = Artist.query.filter(
-        Artist.name.ilike("%{}%".format(search_query))).all()  # Queries row(s) from Artist table with name fully or partially matching search_query
+    # the form POSTs the first page, next/prev links GET the following ones
+    search_query = request.values.get("search_term", "")
+    # ranked matches on name, city, state and genres from the search index
+    matches = search_subquery(Artist, search_query)
+    results_query = db.session.query(
+        Artist.id,
+        Artist.name,
+        matches.c.rank,
+        Artist.upcoming_shows_count.label("num_upcoming_shows"),
+    ).join(matches, matches.c.id == Artist.id)
+    page = paginate(
+        results_query, [matches.c.rank, Artist.id], url_args={"search_term": search_query}
+    )
     response = {
-        "count": len(search_results)
+        "count": db.session.query(func.count()).select_from(matches).scalar(),
+        "data": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "num_upcoming_shows": row.num_upcoming_shows,
+            }
+            for row in page.items
+        ],
     }
-    data = []
-    for result in search_results:
-        result_data = {
-            "id": result.id,
-            "name": result.name,
-            # filters out past shows
-            "num_upcoming_shows": len(list(filter(lambda show: show.start_time > datetime.now(), result.shows))),
-        }
-        data.append(result_data)
-    response["data"] = data
 
     return render_template(
         "pages/search_artists.html",
         results=response,
-        search_term=request.form.get("search_term", ""),
+        search_term=search_query,
+        page=page,
     )
 
 
-@app.route("/artists/<int:artist_id>")
+@main.route("/artists/<int:artist_id>")
+@conditional(artist_version)
+@response_cache.cached("artist:{artist_id}", "venues")
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
-    artist = Artist.query.get(artist_id)
+    artist = Artist.query.options(noload(Artist.shows), selectinload(Artist.genres)).get(artist_id)
     if artist == None:
         abort(404)
     data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": artist.genres.split(", "),
+        "genres": [genre.name for genre in artist.genres],
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -369,38 +544,26 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
     }
 
-    # GETTING PAST SHOWS FOR THE CURRENT ARTIST
-    past_shows_results = filter(
-        lambda show: show.start_time < datetime.now(), artist.shows
+    # GETTING PAST AND UPCOMING SHOWS FOR THE CURRENT ARTIST
+    # one query joins the artist's shows to their venues, ordered by start_time
+    show_rows = (
+        db.session.query(
+            Show.start_time,
+            Venue.id.label("venue_id"),
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link"),
+            (Show.start_time > datetime.now()).label("is_upcoming"),
+        )
+        .join(Venue, Venue.id == Show.venue_id)
+        .filter(Show.artist_id == artist_id)
+        .order_by(Show.start_time)
+        .all()
+    )
+    past_shows, upcoming_shows = split_show_rows(
+        show_rows, ("venue_id", "venue_name", "venue_image_link")
     )
-    past_shows = []
-    for past_show in past_shows_results:
-        venue = Venue.query.get(past_show.venue_id)
-        past_show_data = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(past_show.start_time),
-        }
-        past_shows.append(past_show_data)
     data["past_shows"] = past_shows
     data["past_shows_count"] = len(past_shows)
-
-    # GETTING UPCOMING SHOWS FOR THE CURRENT VENUE
-    upcoming_shows_results = filter(
-        lambda show: show.start_time > datetime.now(), artist.shows
-    )
-    upcoming_shows = []
-    for up_show in upcoming_shows_results:
-        venue = Venue.query.get(up_show.venue_id)
-
-        up_show_data = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(up_show.start_time),
-        }
-        upcoming_shows.append(up_show_data)
     data["upcoming_shows"] = upcoming_shows
     data["upcoming_shows_count"] = len(upcoming_shows)
     return render_template("pages/show_artist.html", artist=data)
@@ -408,16 +571,18 @@ def show_artist(artist_id):
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route("/artists/<int:artist_id>/edit", methods=["GET"])
+@main.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
+    from forms import ArtistForm
+
     form = ArtistForm()
-    artist = Artist.query.get(artist_id)
-    form.genres.data = artist.genres.split(", ")  # splitting back in to a list
+    artist = Artist.query.options(noload(Artist.shows), selectinload(Artist.genres)).get(artist_id)
+    form.genres.data = [genre.name for genre in artist.genres]
     form.state.data = artist.state
     data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": artist.genres.split(", "),  # splitting back in to a list
+        "genres": [genre.name for genre in artist.genres],
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -431,22 +596,24 @@ def edit_artist(artist_id):
     return render_template("forms/edit_artist.html", form=form, artist=data)
 
 
-@app.route("/artists/<int:artist_id>/edit", methods=["POST"])
+@main.route("/artists/<int:artist_id>/edit", methods=["POST"])
 def edit_artist_submission(artist_id):
     # artist record with ID <artist_id> using the new attributes
+    from forms import ArtistForm
+
     form = ArtistForm(request.form)
 
     if form.validate():
         error = None
         try:
-            artist = Artist.query.get(artist_id)
+            artist = Artist.query.options(noload(Artist.shows), selectinload(Artist.genres)).get(artist_id)
             artist.name = form.name.data
             artist.city = form.city.data
             artist.state = form.state.data
             artist.phone = form.phone.data
             artist.image_link = form.image_link.data
             artist.facebook_link = form.facebook_link.data
-            artist.genres = ", ".join(form.genres.data)
+            artist.genres = Genre.from_names(form.genres.data)
             artist.website_link = form.website_link.data
             artist.searching_venue = form.seeking_venue.data
             artist.seeking_description = form.seeking_description.data
@@ -463,27 +630,29 @@ def edit_artist_submission(artist_id):
             abort(500)
         else:
             # on successful db insert, flash success
+            response_cache.invalidate("artists", f"artist:{artist_id}")
             flash(form.name.data + ", your info was successfully updated!")
-            return redirect(url_for("show_artist", artist_id=artist_id))
+            return redirect(url_for("main.show_artist", artist_id=artist_id))
     else:
-        artist = Artist.query.get(artist_id)
+        artist = Artist.query.options(noload(Artist.shows), selectinload(Artist.genres)).get(artist_id)
         error_msg = error_msg_constructor(form.errors)
         flash(
             f"Artist, \"{form.name.data}\" info could not be updated. An error occurred ({error_msg})", "error")
         return render_template("forms/edit_artist.html", form=form, artist=artist)
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["GET"])
+@main.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
+    from forms import VenueForm
+
     form = VenueForm()
-    venue = Venue.query.get(venue_id)
-    form.genres.data = venue.genres.split(
-        ", ")  # split each genre back to a list
+    venue = Venue.query.options(noload(Venue.shows), selectinload(Venue.genres)).get(venue_id)
+    form.genres.data = [genre.name for genre in venue.genres]
     form.state.data = venue.state
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": venue.genres.split(", "),  # split each genre back to a list
+        "genres": [genre.name for genre in venue.genres],
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -497,15 +666,17 @@ def edit_venue(venue_id):
     return render_template("forms/edit_venue.html", form=form, venue=data)
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["POST"])
+@main.route("/venues/<int:venue_id>/edit", methods=["POST"])
 def edit_venue_submission(venue_id):
     # venue record with ID <venue_id> using the new attributes
+    from forms import VenueForm
+
     form = VenueForm(request.form)
 
     if form.validate():
         error = None
         try:
-            venue = Venue.query.get(venue_id)
+            venue = Venue.query.options(noload(Venue.shows), selectinload(Venue.genres)).get(venue_id)
             venue.name = form.name.data
             venue.city = form.city.data
             venue.state = form.state.data
@@ -513,7 +684,7 @@ def edit_venue_submission(venue_id):
             venue.address = form.address.data
             venue.image_link = form.image_link.data
             venue.facebook_link = form.facebook_link.data
-            venue.genres = ", ".join(form.genres.data)
+            venue.genres = Genre.from_names(form.genres.data)
             venue.website_link = form.website_link.data
             venue.searching_talent = form.seeking_talent.data
             venue.seeking_description = form.seeking_description.data
@@ -530,11 +701,12 @@ def edit_venue_submission(venue_id):
             abort(500)
         else:
             # on successful db insert, flash success
+            response_cache.invalidate("venues", f"venue:{venue_id}")
             flash("Venue " + form.name.data +
                   " info was successfully updated!")
-            return redirect(url_for("show_venue", venue_id=venue_id))
+            return redirect(url_for("main.show_venue", venue_id=venue_id))
     else:
-        venue = Venue.query.get(venue_id)
+        venue = Venue.query.options(noload(Venue.shows), selectinload(Venue.genres)).get(venue_id)
         error_msg = error_msg_constructor(form.errors)
         flash(
             f"Venue, \"{form.name.data}\" info could not be updated. An error occurred ({error_msg})", "error")
@@ -545,15 +717,19 @@ def edit_venue_submission(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route("/artists/create", methods=["GET"])
+@main.route("/artists/create", methods=["GET"])
 def create_artist_form():
+    from forms import ArtistForm
+
     form = ArtistForm()
     return render_template("forms/new_artist.html", form=form)
 
 
-@app.route("/artists/create", methods=["POST"])
+@main.route("/artists/create", methods=["POST"])
 def create_artist_submission():
     # called upon submitting the new artist listing form
+    from forms import ArtistForm
+
     form = ArtistForm(request.form)
     if form.validate():
         error = False
@@ -564,7 +740,7 @@ def create_artist_submission():
             phone = form.phone.data
             image_link = form.image_link.data
             facebook_link = form.facebook_link.data
-            genres = ", ".join(form.genres.data)
+            genres = Genre.from_names(form.genres.data)
             website_link = form.website_link.data
             searching_venue = form.seeking_venue.data
             seeking_description = form.seeking_description.data
@@ -595,9 +771,10 @@ def create_artist_submission():
             abort(500)
         else:
             # on successful db insert, flash success
+            response_cache.invalidate("artists")
             flash("Artist, " +
                   request.form["name"] + " was successfully listed!")
-            return redirect(url_for("artists"))
+            return redirect(url_for("main.artists"))
             # return render_template('pages/home.html')
     else:
         error_msg = error_msg_constructor(form.errors)
@@ -609,95 +786,190 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
-@app.route("/shows")
+@main.route("/shows")
+@conditional(shows_version)
+@response_cache.cached("shows", "venues", "artists")
 def shows():
-    # displays list of shows at /shows
-    data = []
-    shows = Show.query.all()
-    for show in shows:
-        artist = Artist.query.get(show.artist_id)
-        venue = Venue.query.get(show.venue_id)
-        show_data = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(show.start_time),
+    # displays list of shows at /shows, joined to their venue and artist
+    shows_query = (
+        db.session.query(
+            Show.start_time,
+            Show.artist_id,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Venue.id == Show.venue_id)
+        .join(Artist, Artist.id == Show.artist_id)
+    )
+    filters = show_filters(request.args)
+    shows_query = filter_shows(shows_query, filters)
+    page = paginate(
+        shows_query,
+        [Show.start_time, Show.artist_id, Show.venue_id],
+        lazy=current_app.config["STREAM_TEMPLATES"],
+    )
+    data = (
+        {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
         }
-        data.append(show_data)
-    data.reverse
-    return render_template("pages/shows.html", shows=data)
+        for show in page.items
+    )
+    return render_listing(
+        "pages/shows.html", shows=data, page=page, filters=request.args,
+        calendar_args=filters.place_args(),
+    )
 
 
-@app.route("/shows/create")
+@main.route("/shows/calendar")
+@conditional(calendar_version)
+@response_cache.cached("shows", "venues", "artists")
+def shows_calendar():
+    # shows of a week or month, day by day, with the same place filters as /shows
+    view = request.args.get("view", "week")
+    if view not in CALENDAR_VIEWS:
+        abort(400)
+    try:
+        day = date.fromisoformat(request.args.get("date", "")) if request.args.get("date") else date.today()
+    except ValueError:
+        abort(400)
+    filters = show_filters(request.args)
+    first, last, previous, following = calendar_period(view, day)
+    rows = calendar_rows(filters, first, last, current_app.config["CALENDAR_SHOWS_PER_DAY"])
+    place_args = filters.place_args()
+    return render_template(
+        "pages/shows_calendar.html",
+        view=view,
+        first=first,
+        last=last - timedelta(days=1),
+        weeks=calendar_weeks(rows, first, last),
+        place_args=place_args,
+        prev_url=url_for("main.shows_calendar", view=view, date=previous.isoformat(), **place_args),
+        next_url=url_for("main.shows_calendar", view=view, date=following.isoformat(), **place_args),
+    )
+
+
+@main.route("/shows/create")
 def create_shows():
     # renders form. do not touch.
+    from forms import ShowForm
+
     form = ShowForm()
     return render_template("forms/new_show.html", form=form)
 
 
-@app.route("/shows/create", methods=["POST"])
+@main.route("/shows/create", methods=["POST"])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
-    error = None
-    try:
-        form = ShowForm(request.form)
-        artist_id = form.artist_id.data
-        venue_id = form.venue_id.data
-        # start_time = form.start_time.data
-        start_time = request.form.get("start_time", "")
-        show = Show(artist_id=artist_id, venue_id=venue_id,
-                    start_time=start_time)
-        db.session.add(show)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-    finally:
-        db.session.close()
-    if error:
-        flash("An error occurred. Show could not be listed.", 'error')
-        abort(500)
-    else:
-        # on successful db insert, flash success
-        flash("Show was successfully listed!")
-        return redirect(url_for("shows"))
+    from forms import ShowForm
+
+    form = ShowForm(request.form)
+    if not form.validate():
+        error_msg = error_msg_constructor(form.errors)
+        flash(f"Show could not be listed. An error occurred ({error_msg})", "error")
+        return render_template("forms/new_show.html", form=form), 400
+    artist_id = form.artist_id.data
+    venue_id = form.venue_id.data
+    start_time = form.start_time.data
+    end_time = show_end_time(start_time, form.duration.data)
+    missing = [
+        f"{name} {entity_id}"
+        for name, model, entity_id in (("artist", Artist, artist_id), ("venue", Venue, venue_id))
+        if db.session.get(model, entity_id) is None
+    ]
+    if missing:
+        flash(f"Show could not be listed, there is no {' and no '.join(missing)}.", "error")
+        return render_template("forms/new_show.html", form=form), 400
+
+    conflicts = find_conflicts(venue_id, artist_id, start_time, end_time)
+    if not conflicts:
+        db.session.add(Show(artist_id=artist_id, venue_id=venue_id,
+                            start_time=start_time, end_time=end_time))
+        try:
+            db.session.commit()
+        except IntegrityError as error:
+            db.session.rollback()
+            if not is_booking_conflict(error):
+                raise
+            # booked by a concurrent request since the check
+            conflicts = find_conflicts(venue_id, artist_id, start_time, end_time)
+            if not conflicts:
+                # the constraint refused the show but the overlapping one is
+                # gone again (or not visible yet): nothing was listed
+                flash("Show could not be listed, it overlaps another show of the artist "
+                      "or the venue.", "error")
+                return render_template("forms/new_show.html", form=form), 409
+    if conflicts:
+        flash(
+            "Show could not be listed, it overlaps "
+            + ", ".join(
+                f"the show of artist {show.artist_id} at venue {show.venue_id} "
+                f"from {format_datetime(show.start_time)} to {format_datetime(show.end_time)}"
+                for show in conflicts
+            ) + ".",
+            "error",
+        )
+        return render_template("forms/new_show.html", form=form), 409
+
+    # on successful db insert, flash success
+    response_cache.invalidate("shows", f"venue:{venue_id}", f"artist:{artist_id}")
+    flash("Show was successfully listed!")
+    return redirect(url_for("main.shows"))
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+
+@main.route("/export/<entity>.<file_format>")
+def export(entity, file_format):
+    # bulk download for integrations, authenticated with
+    # "Authorization: Bearer <EXPORT_TOKEN>" and disabled without a token
+    token = current_app.config["EXPORT_TOKEN"]
+    if not token or entity not in ENTITIES or file_format not in exporter.FORMATS:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        abort(Response("Authentication required\n", 401, {"WWW-Authenticate": "Bearer"}))
+    compress = "gzip" in request.accept_encodings
+    response = Response(
+        stream_with_context(exporter.export_chunks(entity, file_format, compress)),
+        mimetype="text/csv" if file_format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={entity}.{file_format}"},
+    )
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
 
 
-@app.errorhandler(404)
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template("errors/500.html"), 500
 
 
-if not app.debug:
-    file_handler = FileHandler("error.log")
-    file_handler.setFormatter(
-        Formatter(
-            "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info("errors")
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
-# Default port:
+# Development server only, deploy with gunicorn (gunicorn.conf.py) or uvicorn
+# (asgi.py). Debug mode follows FLASK_DEBUG.
 if __name__ == "__main__":
-    app.debug = True
-    app.run(host="0.0.0.0")
+    create_app().run(host="0.0.0.0")
 
 # Or specify port manually:
 """
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 """
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from sqlalchemy.util import await_only, greenlet_spawn
+from werkzeug.exceptions import HTTPException
+
+from app import create_app, warmup
+from cache import check_workers
+from models import db
+from routing import ASYNC_IO_KEY
+
+# ASGI deployment: WEB_CONCURRENCY=4 uvicorn asgi:application
+#
+# Reads (GET and HEAD, and the search form POSTs) are served on the event
+# loop: the Flask app is called in a greenlet and its queries go through the
+# async driver of an AsyncEngine (aiosqlite, asyncpg), each round trip awaited
+# on the loop the way AsyncSession does it. A worker keeps serving other
+# requests while one waits on the database, instead of holding a thread. The
+# views, templates, response cache and request hooks are the same as under
+# WSGI.
+#
+# Everything else (the create/edit/delete form handlers) runs the WSGI app as
+# before, in a pool of ASGI_THREADS threads with the sync engine.
+#
+# uvicorn reads its number of workers from WEB_CONCURRENCY unless --workers is
+# given. Set workers with WEB_CONCURRENCY so that the app can refuse the
+# per-process "memory" response cache with more than one of them; the check
+# cannot see --workers.
+
+READ_METHODS = ("GET", "HEAD")
+# POST endpoints that only read
+READ_POST_ENDPOINTS = ("main.search_venues", "main.search_artists")
+
+
+# This function builds the WSGI environ of an ASGI http request (PEP 3333)
+
+
+def build_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        # the whole body is buffered, it can be read without a Content-Length
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+# This function runs the WSGI app for `environ` and passes the response to
+# `send`, a blocking callable taking ASGI messages
+
+
+def run_wsgi(wsgi_app, environ, send):
+    start = {}
+
+    def start_response(status, headers, exc_info=None):
+        start["status"] = int(status.split(" ", 1)[0])
+        start["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+        ]
+
+    body = wsgi_app(environ, start_response)
+    try:
+        started = False
+        for chunk in body:
+            if not started:
+                send({"type": "http.response.start", **start})
+                started = True
+            if chunk:
+                send({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not started:
+            send({"type": "http.response.start", **start})
+        send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+class FyyurASGI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=flask_app.config["ASGI_THREADS"], thread_name_prefix="wsgi"
+        )
+
+    def _on_loop(self, environ):
+        if environ["REQUEST_METHOD"] in READ_METHODS:
+            return True
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        return endpoint in READ_POST_ENDPOINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        body = await _read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        if self._on_loop(environ):
+            environ[ASYNC_IO_KEY] = True
+            await greenlet_spawn(
+                run_wsgi, self.flask_app, environ, lambda message: await_only(send(message))
+            )
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor,
+            run_wsgi,
+            self.flask_app,
+            environ,
+            lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result(),
+        )
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                warmup(self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await db.dispose_async_engines()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+flask_app = create_app()
+check_workers(flask_app.config["RESPONSE_CACHE"], int(os.environ.get("WEB_CONCURRENCY", 1)))
+application = FyyurASGI(flask_app)
@@ -0,0 +1,313 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+# Static asset pipeline (`flask fyyur assets`).
+#
+# BUNDLES lists the stylesheets and scripts the layout loads, in order. The
+# build concatenates and minifies each bundle and writes it to static/dist/
+# under a content-hashed name (main.3f2a9c1e0b4d.css), with .gz and .br
+# precompressed copies next to it. Files referenced by url() in the
+# stylesheets (the Font Awesome fonts) are copied and hashed the same way and
+# the references rewritten. static/dist/manifest.json maps every bundle and
+# file to its hashed name.
+#
+# Templates link assets with static_url("main.css"). After a build it
+# resolves the hashed name, served with a far-future immutable Cache-Control
+# since its content never changes under that name, and the .br or .gz copy
+# when the browser accepts it. Without a build (development) a bundle is
+# concatenated from its sources on each request instead. Each app reads the
+# manifest of its own static folder, kept in app.extensions["assets"].
+
+BUNDLES = {
+    "main.css": [
+        "vendor/fontawesome-free-5.15.4/css/all.min.css",
+        "css/bootstrap.min.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    # render blocking, in <head>
+    "head.js": [
+        "js/libs/modernizr-2.8.2.min.js",
+    ],
+    # deferred
+    "main.js": [
+        "js/libs/jquery-1.11.1.min.js",
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/libs/moment.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+}
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+# hex digits of the sha256 kept in hashed names
+HASH_LENGTH = 12
+# already compressed formats get no .gz/.br copy
+COMPRESSIBLE = (".css", ".js", ".svg", ".ttf", ".eot", ".otf", ".json")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+mimetypes.add_type("font/woff", ".woff")
+mimetypes.add_type("font/woff2", ".woff2")
+
+CSS_COMMENT = re.compile(r"/\*(?!!).*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s*([{};,])\s*")
+# innermost braces: declaration blocks, not selectors or @media preludes
+CSS_DECLARATIONS = re.compile(r"\{[^{}]*\}")
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+SOURCE_MAP = re.compile(r"^//[#@] sourceMappingURL=.*$", re.M)
+
+
+#  Minification
+#  ----------------------------------------------------------------
+#
+# Conservative on purpose: the vendor files are shipped minified already, the
+# rest is hand written and small. Comments and whitespace are dropped, nothing
+# is renamed or reordered.
+
+
+def minify_css(text):
+    text = CSS_COMMENT.sub("", text)
+    text = re.sub(r"\s+", " ", text)
+    text = CSS_SPACE.sub(r"\1", text)
+    # spaces around colons only go in declarations, "a :hover" is a
+    # descendant selector
+    text = CSS_DECLARATIONS.sub(lambda block: re.sub(r"\s*:\s*", ":", block.group(0)), text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text):
+    # whole-line comments, indentation and blank lines; code is left as is
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def _hashed_name(path, content):
+    base, ext = posixpath.splitext(posixpath.basename(path))
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+# This function rewrites the relative url()s of the stylesheet `source`
+# (a path under static/) with `resolve`, which takes the path the url points
+# to and returns its new URL or None to leave it alone
+
+
+def rewrite_css_urls(text, source, resolve):
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        new_url = resolve(target)
+        if new_url is None:
+            return match.group(0)
+        return f"url({quote}{new_url}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, text)
+
+
+# This function concatenates the sources of a bundle, minified with `minify`,
+# with the url()s of its stylesheets rewritten by `resolve`
+
+
+def bundle_content(static_folder, name, resolve, minify=True):
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(static_folder, source), encoding="utf-8") as source_file:
+            text = source_file.read()
+        if name.endswith(".css"):
+            text = rewrite_css_urls(text, source, resolve)
+            parts.append(minify_css(text) if minify else text)
+        else:
+            if minify:
+                # the source maps are not part of the build
+                text = SOURCE_MAP.sub("", text)
+                text = text if source.endswith(".min.js") else minify_js(text)
+            # a file without a trailing semicolon must not run into the next
+            parts.append(text.rstrip() + "\n;")
+    return "\n".join(parts).encode("utf-8")
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+
+class BuiltAsset:
+    def __init__(self, name, hashed_name, size, compressed):
+        self.name = name
+        self.hashed_name = hashed_name
+        self.size = size
+        # encoding -> size of the precompressed copy
+        self.compressed = compressed
+
+
+def _write(dist, hashed_name, content):
+    # only the build needs brotli, serving processes do not load it
+    import brotli
+
+    path = os.path.join(dist, hashed_name)
+    compressed = {}
+    if not os.path.exists(path):
+        with open(path, "wb") as output:
+            output.write(content)
+    if hashed_name.endswith(COMPRESSIBLE):
+        variants = {
+            "br": brotli.compress(content, quality=11),
+            "gzip": gzip.compress(content, 9, mtime=0),
+        }
+        for encoding, suffix in ENCODINGS:
+            if len(variants[encoding]) >= len(content):
+                continue
+            with open(path + suffix, "wb") as output:
+                output.write(variants[encoding])
+            compressed[encoding] = len(variants[encoding])
+    return compressed
+
+
+# This function builds every bundle of BUNDLES into static/dist/ and writes
+# the manifest. Files of earlier builds are kept (pages rendered before a
+# deploy still link them) unless `prune` is set.
+
+
+def build_assets(app, prune=False):
+    static_folder = app.static_folder
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest, built = {}, []
+
+    def copy_referenced(target):
+        source = os.path.join(static_folder, target)
+        if not os.path.isfile(source):
+            # left pointing at its original location
+            return posixpath.relpath(target, DIST_DIR)
+        if target not in manifest:
+            with open(source, "rb") as source_file:
+                content = source_file.read()
+            hashed_name = _hashed_name(target, content)
+            built.append(BuiltAsset(target, hashed_name, len(content), _write(dist, hashed_name, content)))
+            manifest[target] = hashed_name
+        # bundles are written to the same directory
+        return manifest[target]
+
+    for name in BUNDLES:
+        content = bundle_content(static_folder, name, copy_referenced)
+        hashed_name = _hashed_name(name, content)
+        built.append(BuiltAsset(name, hashed_name, len(content), _write(dist, hashed_name, content)))
+        manifest[name] = hashed_name
+
+    with open(os.path.join(dist, MANIFEST), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    if prune:
+        keep = {MANIFEST} | {
+            name + suffix for name in manifest.values() for suffix in ("", ".br", ".gz")
+        }
+        for name in os.listdir(dist):
+            if name not in keep:
+                os.remove(os.path.join(dist, name))
+    app.extensions["assets"].reload()
+    return built
+
+
+#  Serving
+#  ----------------------------------------------------------------
+
+
+class Manifest:
+    # the hashed names of one app's build, {} without one
+
+    def __init__(self, path):
+        self.path = path
+        self.names = {}
+        self.mtime = None
+        self.reload()
+
+    def reload(self):
+        # picks up a build made while the app is running
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.names, self.mtime = {}, None
+            return
+        if mtime != self.mtime:
+            with open(self.path) as manifest_file:
+                self.names = json.load(manifest_file)
+            self.mtime = mtime
+
+
+class AssetPipeline:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["assets"] = Manifest(os.path.join(app.static_folder, DIST_DIR, MANIFEST))
+        app.add_url_rule(
+            f"{app.static_url_path}/{DIST_DIR}/<path:filename>", "static_dist", self._serve_dist
+        )
+        app.add_url_rule(
+            f"{app.static_url_path}/bundles/<name>", "static_bundle", self._serve_bundle
+        )
+        app.add_template_global(self.static_url, "static_url")
+
+    @property
+    def manifest(self):
+        # hashed names of the current app's build
+        return current_app.extensions["assets"].names
+
+    def static_url(self, name):
+        current_app.extensions["assets"].reload()
+        hashed_name = self.manifest.get(name)
+        if hashed_name is not None:
+            return url_for("static_dist", filename=hashed_name)
+        if name in BUNDLES:
+            return url_for("static_bundle", name=name)
+        return url_for("static", filename=name)
+
+    def _serve_dist(self, filename):
+        dist = os.path.join(current_app.static_folder, DIST_DIR)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        served, encoding = filename, None
+        for candidate, suffix in ENCODINGS:
+            if request.accept_encodings[candidate] and os.path.isfile(
+                os.path.join(dist, filename + suffix)
+            ):
+                served, encoding = filename + suffix, candidate
+                break
+        response = send_from_directory(
+            dist, served, mimetype=mimetype, max_age=current_app.config["STATIC_ASSETS_MAX_AGE"]
+        )
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def _serve_bundle(self, name):
+        # development: the sources concatenated as they are
+        if name not in BUNDLES:
+            abort(404)
+        static_folder = current_app.static_folder
+
+        def resolve(target):
+            return url_for("static", filename=target)
+
+        content = bundle_content(static_folder, name, resolve, minify=False)
+        response = current_app.response_class(
+            content, mimetype=mimetypes.guess_type(name)[0]
+        )
+        response.cache_control.no_cache = True
+        return response
+
+
+assets = AssetPipeline()
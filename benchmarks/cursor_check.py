@@ -0,0 +1,103 @@
+# ----------------------------------------------------------------------------#
+# Cursor check: tampered pagination cursors are refused with a 400
+#
+#   python benchmarks/cursor_check.py
+#
+# Seeds a throwaway SQLite database like benchmarks/explain_routes.py and
+# requests each keyset-paginated page with the cursors in BAD_CURSORS (not
+# base64, not a JSON list of the page's keys, or key values of the wrong
+# type), expecting a 400 rather than an error from the database. The next
+# link of each first page must still answer 200. Exits non-zero when a case
+# fails.
+# ----------------------------------------------------------------------------#
+
+import base64
+import json
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from explain_routes import seed  # noqa: E402
+from models import db  # noqa: E402
+
+NEXT_LINK = re.compile(r'href="([^"]*cursor=[^"]*direction=next[^"]*)"')
+
+
+def encode(payload):
+    raw = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# cursors refused by every paginated page
+COMMON_CURSORS = [
+    "!!!",
+    encode("City 1")[:-1],
+    encode({"id": 1}),
+    encode([]),
+    # [{},{},{}]
+    "W3t9LHt9LHt9XQ",
+]
+
+# page -> cursors of the right length with a value of the wrong type
+BAD_CURSORS = {
+    "/venues": [
+        [1, "CA", 1], ["City 1", "CA", "1"], ["City 1", "CA", True],
+        ["City 1", "CA", 2 ** 70], ["City 1", ["CA"], 1], ["City 1", "CA", 1.5],
+    ],
+    "/artists": [["1"], [[1]], [{}], [False], [-2 ** 64]],
+    "/shows": [
+        ["not a date", 1, 1], [20300101, 1, 1],
+        ["2030-01-01T20:00:00", {}, 1], ["2030-01-01T20:00:00", 1, "1"],
+    ],
+    "/venues/search?search_term=Hall": [[{}, 1], [[0.5], 1], [0.5, "1"]],
+    "/artists/search?search_term=Band": [[{}, 1], [0.5, [1]], [0.5, 2 ** 64]],
+}
+
+
+def page_url(url, cursor):
+    return url + ("&" if "?" in url else "?") + "cursor=" + cursor
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "cursor.db"),
+            "WTF_CSRF_ENABLED": False,
+            "PAGE_SIZE": 5,
+        })
+        init_migrate(app)
+        with app.app_context():
+            upgrade()
+            seed()
+            client = app.test_client()
+            for url, payloads in BAD_CURSORS.items():
+                first_page = client.get(url).get_data(as_text=True)
+                next_link = NEXT_LINK.search(first_page)
+                status = None
+                if next_link:
+                    status = client.get(next_link.group(1).replace("&amp;", "&")).status_code
+                failures += status != 200
+                print(("ok    " if status == 200 else "FAIL  ") + f"GET {url} next page -> {status}")
+                cases = [(cursor, cursor) for cursor in COMMON_CURSORS]
+                cases += [(json.dumps(payload), encode(payload)) for payload in payloads]
+                for label, cursor in cases:
+                    status = client.get(page_url(url, cursor)).status_code
+                    failures += status != 400
+                    print(("ok    " if status == 400 else "FAIL  ")
+                          + f"GET {url} cursor {label} -> {status}")
+            db.session.remove()
+            db.engine.dispose()
+
+    print("ok" if not failures else f"{failures} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# ----------------------------------------------------------------------------#
+# Render benchmark for the `datetime` Jinja filter
+#
+#   python benchmarks/datetime_filter_benchmark.py --shows 10000
+#
+# Renders pages/shows.html with synthetic shows twice: with the previous filter
+# (str start times re-parsed by dateutil, babel pattern parsed on every call)
+# and with the current one (datetime objects, cached pattern and results).
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template  # noqa: E402
+
+from app import create_app, format_datetime, format_datetime_cached  # noqa: E402
+
+app = create_app()
+
+
+def previous_format_datetime(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale="en")
+
+
+def make_shows(count):
+    # evening shows spread over two years, so start times repeat across tiles
+    start = datetime(2023, 1, 1, 20, 0)
+    return [
+        {
+            "venue_id": i % 100,
+            "venue_name": f"Venue {i % 100}",
+            "artist_id": i % 500,
+            "artist_name": f"Artist {i % 500}",
+            "artist_image_link": "https://example.com/artist.jpg",
+            "start_time": start + timedelta(days=i % 730, hours=i % 3),
+        }
+        for i in range(count)
+    ]
+
+
+def render(shows, repeat):
+    timings = []
+    with app.test_request_context("/shows"):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render_template("pages/shows.html", shows=shows, page=None, filters={},
+                            calendar_args={})
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="datetime filter render benchmark")
+    parser.add_argument("--shows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    shows = make_shows(args.shows)
+    before_shows = [dict(show, start_time=str(show["start_time"])) for show in shows]
+
+    app.jinja_env.filters["datetime"] = previous_format_datetime
+    before_ms = render(before_shows, args.repeat)
+
+    app.jinja_env.filters["datetime"] = format_datetime
+    format_datetime_cached.cache_clear()
+    after_ms = render(shows, args.repeat)
+
+    print(f"pages/shows.html with {args.shows} shows (median of {args.repeat})")
+    print(f"before: {before_ms:8.1f} ms")
+    print(f"after:  {after_ms:8.1f} ms  ({before_ms / after_ms:.1f}x)")
+    print(format_datetime_cached.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# ----------------------------------------------------------------------------#
+# Query plan check: every SQL statement issued by the routes must use an index
+#
+#   python benchmarks/explain_routes.py [-v]
+#
+# Seeds a throwaway SQLite database, drives each route through the Flask test
+# client (following one "next" link per listing so the keyset predicate of deep
+# pages is covered), captures the SELECT statements it runs and feeds them to
+# EXPLAIN QUERY PLAN. Exits non-zero when a statement falls back to a full
+# table scan.
+#
+# A plain "SCAN <table>" is only accepted for a paginated listing: a LIMITed
+# query read in index (or rowid) order with no temp b-tree sort, which stops
+# after one page instead of reading the table.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import html
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from models import db, Artist, Genre, Show, Venue  # noqa: E402
+
+ROUTES = [
+    ("GET", "/venues", None),
+    ("GET", "/venues?genre=Jazz", None),
+    ("GET", "/venues/2", None),
+    ("GET", "/venues/2/edit", None),
+    ("POST", "/venues/search", {"search_term": "hall"}),
+    ("GET", "/artists", None),
+    ("GET", "/artists?genre=Rock n Roll", None),
+    ("GET", "/artists/2", None),
+    ("GET", "/artists/2/edit", None),
+    ("POST", "/artists/search", {"search_term": "band"}),
+    ("GET", "/shows", None),
+    ("GET", f"/shows?from={date.today()}&to={date.today() + timedelta(days=7)}", None),
+    ("GET", f"/shows?from={date.today()}&city=City 1&state=CA", None),
+    ("GET", f"/shows?venue_id=2&from={date.today()}", None),
+    ("GET", "/shows/calendar", None),
+    ("GET", "/shows/calendar?view=month&city=City 1&state=CA", None),
+    ("GET", "/shows/calendar?view=month&venue_id=2", None),
+    # the booking conflict check
+    ("POST", "/shows/create", {"artist_id": 2, "venue_id": 2, "start_time": "2040-01-01 20:00"}),
+]
+
+NEXT_LINK = re.compile(r'class="next"><a href="([^"]+)"')
+ALLOWED_SCANS = re.compile(r"^SCAN (CONSTANT ROW|\S+ VIRTUAL TABLE|anon_\d+|\(subquery)")
+TABLE_SCAN = re.compile(r"^SCAN (\S+)")
+
+
+def seed():
+    now = datetime.now()
+    jazz, rock = Genre(name="Jazz"), Genre(name="Rock n Roll")
+    for i in range(50):
+        db.session.add(Venue(
+            name=f"Music Hall {i}", city=f"City {i % 5}", state="CA", address="1 Main St",
+            phone="123-123-1234", image_link="https://example.com/v.jpg", genres=[jazz],
+        ))
+        db.session.add(Artist(
+            name=f"Wild Band {i}", city=f"City {i % 5}", state="CA", phone="123-123-1234",
+            image_link="https://example.com/a.jpg", genres=[rock],
+        ))
+    db.session.flush()
+    for i in range(50):
+        for j in range(0, 50, 7):
+            db.session.add(Show(artist_id=i + 1, venue_id=j + 1,
+                                start_time=now + timedelta(days=i - j)))
+    db.session.commit()
+
+
+def plan_problems(statement, plan):
+    details = [row[-1] for row in plan]
+    ordered_page = " LIMIT " in statement and not any(
+        "TEMP B-TREE" in detail and "ORDER BY" in detail for detail in details)
+    problems = []
+    for detail in details:
+        match = TABLE_SCAN.match(detail)
+        if not match or ALLOWED_SCANS.match(detail):
+            continue
+        if ordered_page:
+            continue
+        problems.append(detail)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN check of the routes")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "explain.db"),
+            "WTF_CSRF_ENABLED": False,
+        })
+        init_migrate(app)
+        with app.app_context():
+            upgrade()
+            seed()
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith("SELECT"):
+                    statements.append((statement, parameters))
+
+            event.listen(db.engine, "before_cursor_execute", capture)
+            client = app.test_client()
+            routes = list(ROUTES)
+            for method, url, data in routes:
+                del statements[:]
+                response = client.open(url, method=method, data=data)
+                captured = list(statements)
+                print(f"{method} {url} -> {response.status_code}, {len(captured)} statements")
+                if response.status_code >= 400:
+                    failures += 1
+                # deep pages run the keyset predicate, check the next page too
+                next_link = NEXT_LINK.search(response.get_data(as_text=True))
+                # only the keyset pager is followed, not the calendar's next week
+                if next_link and "cursor=" in next_link.group(1) and "cursor=" not in url:
+                    routes.append(("GET", html.unescape(next_link.group(1)), None))
+                with db.engine.connect() as conn:
+                    for statement, parameters in captured:
+                        plan = conn.exec_driver_sql(
+                            "EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                        problems = plan_problems(statement, plan)
+                        if args.verbose or problems:
+                            print("   ", " ".join(statement.split()))
+                            for row in plan:
+                                print("       ", row[-1])
+                        for problem in problems:
+                            failures += 1
+                            print("    FULL TABLE SCAN:", problem)
+            event.remove(db.engine, "before_cursor_execute", capture)
+            db.session.remove()
+            db.engine.dispose()
+
+    print("ok" if not failures else f"{failures} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
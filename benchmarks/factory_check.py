@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------------#
+# Factory check: apps created in one process keep their own configuration
+#
+#   python benchmarks/factory_check.py
+#
+# Creates two apps with create_app() on throwaway SQLite databases: the first
+# with the memory response cache and SQL_STRICT_MAX_DUPLICATES, the second
+# (created after it) with neither. Then checks that the first app still has
+# its cache and enforces its strict limit, and that the second does neither.
+# Exits non-zero when a check fails.
+# ----------------------------------------------------------------------------#
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from cache import response_cache  # noqa: E402
+from explain_routes import seed  # noqa: E402
+from models import db  # noqa: E402
+from perf import RepeatedQueryError  # noqa: E402
+
+
+def check(failures, ok, message):
+    print(("ok    " if ok else "FAIL  ") + message)
+    if not ok:
+        failures.append(message)
+
+
+def make_app(tmp, name, config):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, name + ".db"),
+        "WTF_CSRF_ENABLED": False,
+        **config,
+    })
+    init_migrate(app)
+    with app.app_context():
+        upgrade()
+        seed()
+        db.session.remove()
+    return app
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        first = make_app(tmp, "first", {
+            "RESPONSE_CACHE": "memory",
+            "SQL_STRICT_MAX_DUPLICATES": 0,
+            "PROPAGATE_EXCEPTIONS": True,
+        })
+        second = make_app(tmp, "second", {"RESPONSE_CACHE": None})
+
+        with first.test_request_context("/"):
+            check(failures, response_cache.enabled, "first app keeps its response cache")
+        with second.test_request_context("/"):
+            check(failures, not response_cache.enabled, "second app has no response cache")
+
+        try:
+            status = first.test_client().get("/venues").status_code
+        except RepeatedQueryError:
+            status = "RepeatedQueryError"
+        check(failures, status == "RepeatedQueryError",
+              f"first app enforces SQL_STRICT_MAX_DUPLICATES=0 ({status})")
+        response = second.test_client().get("/venues")
+        check(failures, response.status_code == 200 and "X-Cache" not in response.headers,
+              f"second app neither strict nor cached ({response.status_code})")
+
+        for app in (first, second):
+            with app.app_context():
+                db.engine.dispose()
+
+    print("ok" if not failures else f"{len(failures)} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# ----------------------------------------------------------------------------#
+# Bulk import check: `flask fyyur import` edge cases
+#
+#   python benchmarks/import_check.py
+#
+# Seeds a throwaway SQLite database like benchmarks/explain_routes.py, with
+# the memory response cache on, and imports small JSONL files through
+# importer.import_file:
+#   - a batch mixing records with and without an id, the explicit id being
+#     the next free one: every record is imported under its own id;
+#   - shows naming their artist with a number: rejected, the rest imported;
+#   - a committed batch invalidates the cached pages it changed.
+# Exits non-zero when a case fails.
+# ----------------------------------------------------------------------------#
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from explain_routes import seed  # noqa: E402
+from importer import import_file  # noqa: E402
+from models import db, Show, Venue  # noqa: E402
+
+VENUE = {
+    "city": "Austin", "state": "TX", "address": "1 Main St", "phone": "123-123-1234",
+    "image_link": "https://example.com/venue.jpg", "genres": ["Jazz"],
+}
+
+
+def write_jsonl(directory, name, records):
+    path = os.path.join(directory, name)
+    with open(path, "w") as output:
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+    return path
+
+
+def check(failures, ok, message):
+    print(("ok    " if ok else "FAIL  ") + message)
+    if not ok:
+        failures.append(message)
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "import.db"),
+            "WTF_CSRF_ENABLED": False,
+            "RESPONSE_CACHE": "memory",
+        })
+        init_migrate(app)
+        with app.app_context():
+            upgrade()
+            seed()
+            client = app.test_client()
+            client.get("/venues")
+            rejected = []
+
+            # the record without an id must not be given the explicit one
+            next_id = db.session.query(func.max(Venue.id)).scalar() + 1
+            path = write_jsonl(tmp, "venues.jsonl", [
+                {**VENUE, "name": "No Id Hall"},
+                {**VENUE, "name": "Explicit Id Hall", "id": next_id},
+            ])
+            result = import_file(path, "venues", reject=lambda *reason: rejected.append(reason))
+            names = dict(db.session.query(Venue.name, Venue.id).filter(
+                Venue.name.in_(["No Id Hall", "Explicit Id Hall"])))
+            check(failures, result.imported == 2 and names.get("Explicit Id Hall") == next_id
+                  and names.get("No Id Hall") not in (None, next_id),
+                  f"mixed batch imported with distinct ids {names}")
+
+            response = client.get("/venues")
+            check(failures, response.headers.get("X-Cache") == "MISS"
+                  and "No Id Hall" in response.get_data(as_text=True),
+                  "venue listing invalidated by the import")
+
+            start = (datetime.now() + timedelta(days=900)).replace(second=0, microsecond=0)
+            first, second = (f"{start + timedelta(days=day):%Y-%m-%d %H:%M}" for day in (0, 1))
+            path = write_jsonl(tmp, "shows.jsonl", [
+                {"artist_name": 7, "venue_id": 1, "start_time": first},
+                {"artist_id": 1, "venue_id": 1, "start_time": second},
+            ])
+            del rejected[:]
+            result = import_file(path, "shows", reject=lambda *reason: rejected.append(reason))
+            check(failures, result.imported == 1 and [number for number, _ in rejected] == [1],
+                  f"non-string artist_name rejected {rejected}")
+            check(failures, db.session.query(Show).filter(Show.start_time >= start).count() == 1,
+                  "the valid show imported")
+
+            db.session.remove()
+            db.engine.dispose()
+
+    print("ok" if not failures else f"{len(failures)} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# ----------------------------------------------------------------------------#
+# Load comparison of the sync (WSGI) and ASGI deployments
+#
+#   python benchmarks/load_benchmark.py --connections 500 --duration 20
+#
+# Seeds a SQLite database with benchmarks/seed.py (or reuses one given with
+# --db), then for each mode starts one server process on it and keeps
+# --connections keep-alive connections busy for --duration seconds with GETs
+# of the read pages:
+#   sync  flask run --with-threads (app.run, a thread per connection)
+#   asgi  uvicorn asgi:application (reads on the event loop, aiosqlite)
+#   gunicorn  gunicorn -c gunicorn.conf.py (pre-fork, WEB_CONCURRENCY workers)
+# and reports requests/s, p50 and p99 latency and failed requests per mode.
+# The client is asyncio with raw HTTP/1.1, so it needs no extra packages and
+# takes little CPU away from the server.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    "sync": ["flask", "run", "--with-threads", "--no-reload", "--no-debugger", "--port", "{port}"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application", "--port", "{port}",
+             "--log-level", "warning", "--backlog", "2048"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                 "--bind", "127.0.0.1:{port}", "--backlog", "2048"],
+}
+
+
+def paths(venues, artists, count=1000, seed=7):
+    rng = random.Random(seed)
+    choices = [
+        lambda: "/venues",
+        lambda: "/artists",
+        lambda: "/shows",
+        lambda: f"/venues/{rng.randint(1, venues)}",
+        lambda: f"/artists/{rng.randint(1, artists)}",
+        lambda: f"/api/v1/venues/{rng.randint(1, venues)}",
+    ]
+    return [rng.choice(choices)() for _ in range(count)]
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    keep_alive = headers.get("connection", "").lower() != "close" and lines[0].startswith("HTTP/1.1")
+    return status, keep_alive
+
+
+async def _connection(port, targets, deadline, latencies, failures):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = random.choice(targets)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            failures.append(path)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures.append(path)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, targets, connections, duration):
+    latencies, failures = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _connection(port, targets, deadline, latencies, failures) for _ in range(connections)
+    ])
+    elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def run_mode(mode, db_path, targets, args):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path, FLASK_APP="app")
+    command = [part.format(port=port) for part in MODES[mode]]
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for(port)
+        # warm up templates, caches and the pool before measuring
+        asyncio.run(load(port, targets, 10, 2))
+        latencies, failures, elapsed = asyncio.run(
+            load(port, targets, args.connections, args.duration)
+        )
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan"),
+        "failed": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sync vs ASGI load comparison")
+    parser.add_argument("--db", help="seeded SQLite file to reuse")
+    parser.add_argument("--venues", type=int, default=500)
+    parser.add_argument("--artists", type=int, default=1000)
+    parser.add_argument("--shows", type=int, default=50000)
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--modes", default="sync,asgi", help="any of sync, asgi, gunicorn")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp, "load.db")
+        if not args.db:
+            from seed import create_database
+
+            create_database(db_path, args.venues, args.artists, args.shows)
+        targets = paths(args.venues, args.artists)
+        results = [run_mode(mode, db_path, targets, args) for mode in args.modes.split(",")]
+
+    print(f"{args.connections} connections, {args.duration:.0f}s per mode")
+    print(f"{'mode':<8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for result in results:
+        print(f"{result['mode']:<8} {result['requests']:>9} {result['rps']:>8.1f} "
+              f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# ----------------------------------------------------------------------------#
+# Query growth check: pages run a fixed number of statements and fetch a
+# fixed number of rows however long the show history is
+#
+#   python benchmarks/query_growth.py [--history 200]
+#
+# Builds a throwaway SQLite database, counts the SQL statements and the rows
+# fetched of each route in ROUTES through the Flask test client, then gives
+# venue and artist 1 --history more past shows and counts again. Exits
+# non-zero when a route runs more statements with the longer history (a
+# query per show, an N+1), or fetches more rows than the added shows it lists
+# (shows loaded that the page never uses).
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db, Artist, Genre, Show, Venue  # noqa: E402
+
+VENUE_ID = 1
+ARTIST_ID = 1
+# (url, whether it lists the added shows): /shows and the pages of venue and
+# artist 1 fetch at most one more row per added show, the others none
+ROUTES = [
+    ("/venues", False),
+    ("/artists", False),
+    ("/shows", True),
+    (f"/venues/{VENUE_ID}", True),
+    (f"/artists/{ARTIST_ID}", True),
+    (f"/venues/{VENUE_ID}/edit", False),
+    (f"/artists/{ARTIST_ID}/edit", False),
+]
+
+
+class CountingCursor(sqlite3.Cursor):
+    # rows fetched through the cursor, across all cursors
+    rows = 0
+
+    def fetchone(self):
+        row = super().fetchone()
+        CountingCursor.rows += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        rows = super().fetchmany(*args)
+        CountingCursor.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        CountingCursor.rows += len(rows)
+        return rows
+
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+def seed(count):
+    # venue and artist 1 share an upcoming show, the others are there for
+    # add_history
+    jazz, rock = Genre(name="Jazz"), Genre(name="Rock n Roll")
+    for i in range(count + 1):
+        db.session.add(Venue(
+            name=f"Music Hall {i}", city=f"City {i % 5}", state="CA", address="1 Main St",
+            phone="123-123-1234", image_link="https://example.com/v.jpg", genres=[jazz],
+        ))
+        db.session.add(Artist(
+            name=f"Wild Band {i}", city=f"City {i % 5}", state="CA", phone="123-123-1234",
+            image_link="https://example.com/a.jpg", genres=[rock],
+        ))
+    db.session.flush()
+    db.session.add(Show(artist_id=ARTIST_ID, venue_id=VENUE_ID,
+                        start_time=datetime.now() + timedelta(days=1)))
+    db.session.commit()
+
+
+def add_history(count):
+    # past shows of the checked venue with each other artist and of the
+    # checked artist at each other venue
+    start = datetime.now().replace(microsecond=0) - timedelta(days=count + 1)
+    rows = []
+    for i in range(count):
+        rows.append({"venue_id": VENUE_ID, "artist_id": ARTIST_ID + 1 + i,
+                     "start_time": start + timedelta(days=i)})
+        rows.append({"venue_id": VENUE_ID + 1 + i, "artist_id": ARTIST_ID,
+                     "start_time": start + timedelta(days=i, hours=12)})
+    db.session.execute(Show.__table__.insert(), rows)
+    db.session.commit()
+
+
+def measure(client):
+    # url -> (statements, rows fetched)
+    counts = {}
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        for url, _ in ROUTES:
+            del statements[:]
+            CountingCursor.rows = 0
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} -> {response.status_code}")
+            counts[url] = (len(statements), CountingCursor.rows)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="statement and row count growth check")
+    parser.add_argument("--history", type=int, default=200, help="past shows added")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "growth.db"),
+            "WTF_CSRF_ENABLED": False,
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"factory": CountingConnection}},
+        })
+        with app.app_context():
+            db.create_all()
+            seed(args.history)
+            client = app.test_client()
+            before = measure(client)
+            add_history(args.history)
+            after = measure(client)
+            for url, lists_history in ROUTES:
+                statements_before, rows_before = before[url]
+                statements_after, rows_after = after[url]
+                problems = []
+                if statements_after > statements_before:
+                    problems.append("STATEMENTS GREW")
+                if rows_after - rows_before > (args.history if lists_history else 0):
+                    problems.append("ROWS GREW")
+                failures += len(problems)
+                print(f"GET {url}: {statements_before} -> {statements_after} statements, "
+                      f"{rows_before} -> {rows_after} rows " + " ".join(problems))
+            db.session.remove()
+            db.engine.dispose()
+
+    print("ok" if not failures else f"{failures} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
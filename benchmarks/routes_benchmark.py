@@ -0,0 +1,205 @@
+# ----------------------------------------------------------------------------#
+# Route benchmark suite
+#
+#   python benchmarks/routes_benchmark.py --venues 1000 --artists 1000 \
+#       --shows 100000 --requests 50 --output results.json
+#
+# Seeds a SQLite database with benchmarks/seed.py (or reuses one given with
+# --db), then drives every route in app.py through the Flask test client and
+# reports per route: p50/p95 latency, SQL statements per request and peak
+# Python memory of one request (tracemalloc). Results are written as JSON,
+# tagged with the current git commit, so runs can be compared across commits.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from seed import create_database  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_routes(venues, artists):
+    # (name, method, url, payload); payload may be a callable taking the request
+    # number, so write routes create / delete a different row each time
+    new_ids = count(1)
+    deleted_venues = count(venues, -1)
+    show_venues = count(1)
+    show_slots = count(0)
+    venue_form = {
+        "city": "Austin", "state": "TX", "address": "1 Main St", "phone": "123-123-1234",
+        "image_link": "https://example.com/venue.jpg", "genres": ["Jazz", "Blues"],
+        "facebook_link": "", "website_link": "", "seeking_description": "",
+    }
+    artist_form = {
+        "city": "Austin", "state": "TX", "phone": "123-123-1234",
+        "image_link": "https://example.com/artist.jpg", "genres": ["Rock n Roll"],
+        "facebook_link": "", "website_link": "", "seeking_description": "",
+    }
+    # past the seeded shows, one slot per request so bookings never overlap
+    first_show = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=400)
+    venue_id, artist_id = max(1, venues // 2), max(1, artists // 2)
+    return [
+        ("index", "GET", "/", None),
+        ("venues", "GET", "/venues", None),
+        ("venues_genre", "GET", "/venues?genre=Jazz", None),
+        ("search_venues", "POST", "/venues/search", {"search_term": "music hall"}),
+        ("show_venue", "GET", f"/venues/{venue_id}", None),
+        ("create_venue_form", "GET", "/venues/create", None),
+        ("create_venue_submission", "POST", "/venues/create",
+         lambda: dict(venue_form, name=f"Bench Venue {next(new_ids)}")),
+        ("edit_venue", "GET", f"/venues/{venue_id}/edit", None),
+        ("edit_venue_submission", "POST", f"/venues/{venue_id}/edit",
+         lambda: dict(venue_form, name=f"Edited Venue {next(new_ids)}")),
+        ("artists", "GET", "/artists", None),
+        ("artists_genre", "GET", "/artists?genre=Rock n Roll", None),
+        ("search_artists", "POST", "/artists/search", {"search_term": "band"}),
+        ("show_artist", "GET", f"/artists/{artist_id}", None),
+        ("create_artist_form", "GET", "/artists/create", None),
+        ("create_artist_submission", "POST", "/artists/create",
+         lambda: dict(artist_form, name=f"Bench Artist {next(new_ids)}")),
+        ("edit_artist", "GET", f"/artists/{artist_id}/edit", None),
+        ("edit_artist_submission", "POST", f"/artists/{artist_id}/edit",
+         lambda: dict(artist_form, name=f"Edited Artist {next(new_ids)}")),
+        ("shows", "GET", "/shows", None),
+        ("shows_range", "GET", f"/shows?from={date.today()}&to={date.today() + timedelta(days=2)}", None),
+        ("shows_calendar", "GET", "/shows/calendar?view=month", None),
+        ("create_shows", "GET", "/shows/create", None),
+        ("create_show_submission", "POST", "/shows/create",
+         lambda: {"artist_id": artist_id, "venue_id": next(show_venues), "start_time": (
+             first_show + timedelta(hours=3 * next(show_slots))).strftime("%Y-%m-%d %H:%M")}),
+        ("delete_venue", "POST",
+         lambda: f"/venues/{next(deleted_venues)}", {"confirmDelete": True}),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(client, routes, requests):
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    results = {}
+    for name, method, url, payload in routes:
+        def send():
+            target = url() if callable(url) else url
+            data = payload() if callable(payload) else payload
+            if method == "POST" and name == "delete_venue":
+                return client.post(target, json=data)
+            return client.open(target, method=method, data=data)
+
+        timings, statuses, per_request = [], {}, []
+        for _ in range(requests):
+            del statements[:]
+            started = time.perf_counter()
+            response = send()
+            timings.append((time.perf_counter() - started) * 1000)
+            per_request.append(len(statements))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        tracemalloc.start()
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "method": method,
+            "url": url if isinstance(url, str) else None,
+            "requests": requests,
+            "p50_ms": round(percentile(timings, 0.50), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "sql_statements": max(per_request),
+            "peak_memory_kb": round(peak / 1024, 1),
+            "status": {str(code): n for code, n in sorted(statuses.items())},
+        }
+        print(f"{name:<26}{results[name]['p50_ms']:>10.2f}{results[name]['p95_ms']:>10.2f}"
+              f"{results[name]['sql_statements']:>6}{results[name]['peak_memory_kb']:>12.1f}"
+              f"  {results[name]['status']}")
+    event.remove(db.engine, "before_cursor_execute", count_statement)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route benchmark suite")
+    parser.add_argument("--db", help="reuse an existing seeded SQLite file")
+    parser.add_argument("--venues", type=int, default=1000)
+    parser.add_argument("--artists", type=int, default=1000)
+    parser.add_argument("--shows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=30, help="requests per route")
+    parser.add_argument("--cache", choices=["memory", "disk"], help="enable the response cache")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if path is None:
+            path = os.path.join(tmp, "bench.db")
+            started = time.perf_counter()
+            create_database(path, args.venues, args.artists, args.shows)
+            print(f"seeded {args.venues} venues, {args.artists} artists, {args.shows} shows "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        config = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.abspath(path),
+            "WTF_CSRF_ENABLED": False,
+        }
+        if args.cache:
+            config["RESPONSE_CACHE"] = args.cache
+            config["RESPONSE_CACHE_DIR"] = os.path.join(tmp, "cache")
+        app = create_app(config)
+
+        with app.app_context():
+            print(f"{'route':<26}{'p50 ms':>10}{'p95 ms':>10}{'sql':>6}{'peak KiB':>12}  status")
+            routes = run(app.test_client(), build_routes(args.venues, args.artists), args.requests)
+            db.session.remove()
+            db.engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "dataset": {"venues": args.venues, "artists": args.artists, "shows": args.shows,
+                    "db": args.db},
+        "requests_per_route": args.requests,
+        "cache": args.cache,
+        "routes": routes,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# ----------------------------------------------------------------------------#
+# Search benchmark: ILIKE scan vs. the indexed search in search.py
+#
+#   python benchmarks/search_benchmark.py --rows 100000
+#
+# Seeds a throwaway SQLite database (migrated, so the FTS5 tables and their
+# triggers exist) with synthetic venues, then times both search paths fetching
+# the first page of results, as the search routes do.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+import config  # noqa: E402
+from models import db, Genre, Venue, venue_genres  # noqa: E402
+from search import search_subquery  # noqa: E402
+
+WORDS = [
+    "musical", "hop", "park", "square", "live", "music", "coffee", "dueling",
+    "pianos", "bar", "jazz", "club", "hall", "lounge", "garden", "theatre",
+    "room", "house", "blue", "red", "golden", "velvet", "electric", "sound",
+]
+CITIES = [("San Francisco", "CA"), ("New York", "NY"), ("Austin", "TX"),
+          ("Chicago", "IL"), ("Seattle", "WA"), ("Nashville", "TN")]
+GENRES = ["Jazz", "Rock n Roll", "Blues", "Folk", "Classical", "Hip-Hop", "Soul"]
+PAGE_SIZE = config.PAGE_SIZE
+TERMS = ["hop", "music", "velvet lounge", "Austin", "Jazz", "zzzz"]
+
+
+def seed(rows, batch_size=10000):
+    rng = random.Random(42)
+    db.session.execute(Genre.__table__.insert(), [{"name": name} for name in GENRES])
+    genre_ids = dict(db.session.query(Genre.name, Genre.id).all())
+    for start in range(0, rows, batch_size):
+        venues, links = [], []
+        for venue_id in range(start + 1, min(start + batch_size, rows) + 1):
+            city, state = rng.choice(CITIES)
+            venues.append({
+                "id": venue_id,
+                "name": " ".join(rng.sample(WORDS, 3)).title(),
+                "city": city,
+                "state": state,
+                "address": "1 Main St",
+                "phone": "123-123-1234",
+                "image_link": "https://example.com/venue.jpg",
+            })
+            links.extend(
+                {"venue_id": venue_id, "genre_id": genre_ids[name]}
+                for name in rng.sample(GENRES, 2)
+            )
+        db.session.execute(Venue.__table__.insert(), venues)
+        db.session.execute(venue_genres.insert(), links)
+        db.session.commit()
+
+
+def ilike_search(term):
+    return (
+        db.session.query(Venue.id, Venue.name)
+        .filter(Venue.name.ilike("%{}%".format(term)))
+        .order_by(Venue.id)
+        .limit(PAGE_SIZE)
+        .all()
+    )
+
+
+def indexed_search(term):
+    matches = search_subquery(Venue, term)
+    return (
+        db.session.query(Venue.id, Venue.name, matches.c.rank)
+        .join(matches, matches.c.id == Venue.id)
+        .order_by(matches.c.rank, Venue.id)
+        .limit(PAGE_SIZE)
+        .all()
+    )
+
+
+def timed(fn, term, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(term)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ILIKE vs. indexed search benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db")})
+        init_migrate(app)
+        with app.app_context():
+            upgrade()
+            started = time.perf_counter()
+            seed(args.rows)
+            print(f"seeded {args.rows} venues in {time.perf_counter() - started:.1f}s")
+            print(f"{'term':<16}{'ilike ms':>10}{'rows':>8}{'indexed ms':>12}{'rows':>8}")
+            for term in TERMS:
+                ilike_ms, ilike_rows = timed(ilike_search, term, args.repeat)
+                indexed_ms, indexed_rows = timed(indexed_search, term, args.repeat)
+                print(f"{term:<16}{ilike_ms:>10.1f}{ilike_rows:>8}{indexed_ms:>12.1f}{indexed_rows:>8}")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
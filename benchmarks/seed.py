@@ -0,0 +1,161 @@
+# ----------------------------------------------------------------------------#
+# Synthetic data generator for the benchmarks
+#
+#   python benchmarks/seed.py --db /tmp/fyyur.db --venues 1000 --artists 5000 --shows 100000
+#
+# Creates a migrated SQLite database and fills it with deterministic
+# random venues, artists, genres and shows using batched Core inserts, so
+# catalogs from 1k up to 1M rows can be generated in reasonable time.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from counters import refresh_upcoming_counts  # noqa: E402
+from forms import GENRE_CHOICES, STATE_CHOICES  # noqa: E402
+from models import (  # noqa: E402
+    db, Artist, Genre, Show, Venue, DEFAULT_SHOW_DURATION, artist_genres, venue_genres,
+)
+
+WORDS = [
+    "musical", "hop", "park", "square", "live", "music", "coffee", "dueling",
+    "pianos", "bar", "jazz", "club", "hall", "lounge", "garden", "theatre",
+    "room", "house", "blue", "red", "golden", "velvet", "electric", "sound",
+    "wild", "sax", "band", "guns", "petals", "matt", "quevado", "collective",
+]
+CITIES = [
+    "San Francisco", "New York", "Austin", "Chicago", "Seattle", "Nashville",
+    "Portland", "Denver", "Boston", "Atlanta", "Detroit", "Miami",
+]
+# the same values the forms offer
+GENRES = [value for value, _ in GENRE_CHOICES]
+STATES = [value for value, _ in STATE_CHOICES]
+BATCH_SIZE = 10000
+
+
+def _name(rng):
+    return " ".join(rng.sample(WORDS, rng.randint(2, 3))).title()
+
+
+def _insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def _entities(rng, count, link_fk, genre_ids, extra):
+    # yields (entity row, genre link rows) with explicit ids
+    for entity_id in range(1, count + 1):
+        row = {
+            "id": entity_id,
+            "name": _name(rng),
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "phone": "123-123-1234",
+            "image_link": "https://example.com/{}.jpg".format(entity_id),
+        }
+        row.update(extra)
+        links = [
+            {link_fk: entity_id, "genre_id": genre_id}
+            for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+        ]
+        yield row, links
+
+
+def seed_database(venues, artists, shows, seed=42):
+    if shows > venues * artists:
+        raise ValueError("shows are unique per (artist, venue): at most venues * artists")
+    rng = random.Random(seed)
+
+    db.session.execute(Genre.__table__.insert(), [{"name": name} for name in GENRES])
+    genre_ids = [genre_id for genre_id, in db.session.query(Genre.id)]
+
+    for model, link_table, link_fk, count, extra in (
+        (Venue, venue_genres, "venue_id", venues, {"address": "1 Main St"}),
+        (Artist, artist_genres, "artist_id", artists, {}),
+    ):
+        rows, links = [], []
+        for row, row_links in _entities(rng, count, link_fk, genre_ids, extra):
+            rows.append(row)
+            links.extend(row_links)
+            if len(rows) == BATCH_SIZE:
+                _insert_batches(model.__table__, rows)
+                _insert_batches(link_table, links)
+                rows, links = [], []
+        _insert_batches(model.__table__, rows)
+        _insert_batches(link_table, links)
+        db.session.commit()
+
+    # show k pairs artist k % artists with venue k // artists, start times
+    # spread over a year before and after now in 3 hour slots that neither
+    # the artist nor the venue has taken yet, so no bookings overlap
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    taken = set()
+
+    def free_slot(artist_id, venue_id):
+        while True:
+            slot = rng.randint(-365 * 8, 365 * 8)
+            if ("artist", artist_id, slot) not in taken and ("venue", venue_id, slot) not in taken:
+                taken.update((("artist", artist_id, slot), ("venue", venue_id, slot)))
+                return now + timedelta(hours=3 * slot)
+
+    def show_rows():
+        for k in range(shows):
+            artist_id, venue_id = k % artists + 1, k // artists % venues + 1
+            start_time = free_slot(artist_id, venue_id)
+            yield {
+                "artist_id": artist_id,
+                "venue_id": venue_id,
+                "start_time": start_time,
+                "end_time": start_time + DEFAULT_SHOW_DURATION,
+            }
+
+    _insert_batches(Show.__table__, show_rows())
+    for model in (Venue, Artist):
+        refresh_upcoming_counts(model)
+    db.session.commit()
+
+
+def create_database(path, venues, artists, shows, seed=42):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.abspath(path)})
+    init_migrate(app)
+    with app.app_context():
+        upgrade()
+        seed_database(venues, artists, shows, seed)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a SQLite database with synthetic data")
+    parser.add_argument("--db", required=True, help="SQLite file to create")
+    parser.add_argument("--venues", type=int, default=1000)
+    parser.add_argument("--artists", type=int, default=1000)
+    parser.add_argument("--shows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        sys.exit(f"{args.db} already exists")
+    started = time.perf_counter()
+    create_database(args.db, args.venues, args.artists, args.shows, args.seed)
+    print(f"seeded {args.venues} venues, {args.artists} artists, {args.shows} shows "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
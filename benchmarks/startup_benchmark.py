@@ -0,0 +1,174 @@
+# ----------------------------------------------------------------------------#
+# Startup benchmark: import time and time to first response
+#
+#   python benchmarks/startup_benchmark.py --runs 5 --output startup.json
+#   python benchmarks/startup_benchmark.py --baseline startup.json
+#
+# Runs `python -X importtime -c "import app"` --runs times and reports the
+# median total import time of app.py and its slowest direct imports, then
+# starts the production server (gunicorn -c gunicorn.conf.py, one worker) on a
+# seeded SQLite database --runs times and measures from process start to the
+# first 200 response of GET /venues. Results are written as JSON tagged with
+# the git commit; with --baseline, exits with status 1 when a median is more
+# than --tolerance slower than in the baseline file.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.error import URLError
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes_benchmark import ROOT, git_commit  # noqa: E402
+from seed import create_database  # noqa: E402
+
+# modules the serving processes should not load at startup
+DEFERRED = ("alembic", "babel", "dateutil", "flask_migrate", "flask_moment", "flask_wtf",
+            "sqlalchemy.ext.asyncio")
+
+
+# This function parses the -X importtime report (stderr) into
+# (module, depth, cumulative microseconds) in import order
+
+
+def parse_importtime(report):
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(cumulative)))
+    return modules
+
+
+def import_run():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    index = next(i for i, (name, depth, _) in enumerate(modules) if name == "app" and depth == 0)
+    # the imports of app.py are listed before it, up to the previous
+    # top-level module (interpreter startup)
+    first = index
+    while first > 0 and modules[first - 1][1] > 0:
+        first -= 1
+    direct = {name: us for name, depth, us in modules[first:index] if depth == 1}
+    loaded = {name for name, _, _ in modules[first:index]}
+    return modules[index][2], direct, loaded
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def first_response_run(db_path, timeout=60):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path, WEB_CONCURRENCY="1")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urlopen(f"http://127.0.0.1:{port}/venues", timeout=timeout) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError("the server did not answer")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for metric in ("import_ms", "first_response_ms"):
+        before, after = baseline[metric]["median"], report[metric]["median"]
+        change = after / before - 1
+        print(f"{metric:<18}{before:>10.1f}{after:>10.1f}{change:>+9.0%}")
+        if change > tolerance:
+            regressions.append(metric)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db", help="reuse an existing seeded SQLite file")
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports listed")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    totals, direct = [], {}
+    for _ in range(args.runs):
+        total, modules, loaded = import_run()
+        totals.append(total / 1000)
+        for name, us in modules.items():
+            direct.setdefault(name, []).append(us / 1000)
+    deferred_loaded = sorted(
+        name for name in loaded if any(name == module or name.startswith(module + ".")
+                                       for module in DEFERRED)
+    )
+    slowest = sorted(
+        ((statistics.median(times), name) for name, times in direct.items()), reverse=True
+    )[:args.top]
+    print(f"import app: median {statistics.median(totals):.1f} ms, "
+          f"min {min(totals):.1f} ms over {args.runs} runs")
+    for ms, name in slowest:
+        print(f"    {name:<24}{ms:>8.1f} ms")
+    if deferred_loaded:
+        print("loaded at startup although deferred: " + ", ".join(deferred_loaded))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp, "startup.db")
+        if not args.db:
+            create_database(db_path, 100, 100, 1000)
+        first_responses = [first_response_run(db_path) * 1000 for _ in range(args.runs)]
+    print(f"first response: median {statistics.median(first_responses):.1f} ms, "
+          f"min {min(first_responses):.1f} ms over {args.runs} runs")
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(totals), 1), "runs": totals},
+        "slowest_imports_ms": {name: round(ms, 1) for ms, name in slowest},
+        "deferred_loaded": deferred_loaded,
+        "first_response_ms": {
+            "median": round(statistics.median(first_responses), 1), "runs": first_responses,
+        },
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        if regressions or deferred_loaded:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
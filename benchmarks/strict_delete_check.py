@@ -0,0 +1,93 @@
+# ----------------------------------------------------------------------------#
+# Strict mode check: deleting a venue with many shows
+#
+#   python benchmarks/strict_delete_check.py
+#
+# Seeds a throwaway SQLite database like benchmarks/explain_routes.py (venue 1
+# has a show with each of the 50 artists, most of them upcoming) and deletes
+# venue 1 through the Flask test client with SQL_STRICT_MAX_DUPLICATES=3, so
+# a statement run once per deleted show fails the request. Then checks the
+# upcoming counters (counters.counter_drift) and that the artists' updated_at
+# was touched. Exits non-zero when a check fails.
+# ----------------------------------------------------------------------------#
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, init_migrate  # noqa: E402
+from counters import counter_drift  # noqa: E402
+from explain_routes import seed  # noqa: E402
+from models import db, Artist, Show, Venue  # noqa: E402
+
+VENUE_ID = 1
+MAX_DUPLICATES = 3
+
+
+def check(failures, ok, message):
+    print(("ok    " if ok else "FAIL  ") + message)
+    if not ok:
+        failures.append(message)
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "strict.db"),
+            "WTF_CSRF_ENABLED": False,
+            "SQL_STRICT_MAX_DUPLICATES": MAX_DUPLICATES,
+        })
+        init_migrate(app)
+        with app.app_context():
+            upgrade()
+            seed()
+            artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id)
+                          .filter(Show.venue_id == VENUE_ID)]
+            touched_before = dict(db.session.query(Artist.id, Artist.updated_at)
+                                  .filter(Artist.id.in_(artist_ids)))
+            db.session.remove()
+
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            client = app.test_client()
+            event.listen(db.engine, "before_cursor_execute", capture)
+            try:
+                response = client.post(f"/venues/{VENUE_ID}", json={"confirmDelete": True})
+            finally:
+                event.remove(db.engine, "before_cursor_execute", capture)
+            check(failures, response.status_code == 200 and response.get_json() == {"redirect": True},
+                  f"POST /venues/{VENUE_ID} with {len(artist_ids)} shows -> "
+                  f"{response.status_code}, {len(statements)} statements")
+
+            check(failures, db.session.get(Venue, VENUE_ID) is None
+                  and not db.session.query(Show).filter(Show.venue_id == VENUE_ID).count(),
+                  "venue and its shows deleted")
+            # the seeded shows were inserted through the ORM, with the same listener
+            for model in (Venue, Artist):
+                drift = list(counter_drift(model))
+                check(failures, not drift,
+                      f"{model.__tablename__} upcoming counters match their shows {drift[:5]}")
+            touched_after = dict(db.session.query(Artist.id, Artist.updated_at)
+                                 .filter(Artist.id.in_(artist_ids)))
+            untouched = [artist_id for artist_id in artist_ids
+                         if touched_after[artist_id] <= touched_before[artist_id]]
+            check(failures, not untouched, f"artists of the deleted shows touched {untouched[:5]}")
+
+            db.session.remove()
+            db.engine.dispose()
+
+    print("ok" if not failures else f"{len(failures)} problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+# Response cache for the read pages.
+#
+# Every cached page is stored with the tags it depends on (e.g. "venues",
+# "venue:3") and the version each tag had when the page was rendered. A write
+# handler calls invalidate() with the tags it touched after it commits, which
+# gives those tags a new version, so every page depending on them misses from
+# then on. Tag versions live in the backend next to the pages, which keeps the
+# disk backend consistent across worker processes.
+#
+# response_cache is shared by the views, the backend and the counters of each
+# app are kept in its app.extensions["response_cache"] and looked up through
+# current_app, so apps created with different configs do not share them.
+
+
+class LRUCache:
+    # in-process, least recently used entries are evicted past maxsize. Tag
+    # versions are per process too, so it is for single-process servers only
+    # (flask run, one gunicorn or uvicorn worker)
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    # one pickle file per key, shared by every process using the same directory
+
+    def __init__(self, directory, ttl=300):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                return None
+            with open(path, "rb") as cache_file:
+                return pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        # written to a temporary file first so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as cache_file:
+            pickle.dump(value, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+
+class CacheState:
+    # the backend of one app (None when its cache is off) and its counters
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get("RESPONSE_CACHE")
+        ttl = app.config.get("RESPONSE_CACHE_TTL", 300)
+        if backend == "memory":
+            backend = LRUCache(app.config.get("RESPONSE_CACHE_MAXSIZE", 1024), ttl)
+        elif backend == "disk":
+            backend = DiskCache(app.config["RESPONSE_CACHE_DIR"], ttl)
+        elif backend:
+            raise ValueError(f"Unknown RESPONSE_CACHE backend {backend!r}")
+        app.extensions["response_cache"] = CacheState(backend or None)
+
+    @property
+    def state(self):
+        return current_app.extensions["response_cache"]
+
+    @property
+    def backend(self):
+        return self.state.backend
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def stats(self):
+        state = self.state
+        return {"hits": state.hits, "misses": state.misses}
+
+    def _version(self, tag):
+        version = self.backend.get("tag:" + tag)
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set("tag:" + tag, version)
+        return version
+
+    def invalidate(self, *tags):
+        if not self.enabled:
+            return
+        for tag in tags:
+            self.backend.set("tag:" + tag, uuid.uuid4().hex)
+
+    def _store(self, backend, key, versions, content_type, body):
+        backend.set(key, {
+            "versions": versions,
+            "body": body,
+            "status": 200,
+            "headers": {"Content-Type": content_type},
+        })
+
+    def _store_streamed(self, backend, key, versions, content_type, chunks):
+        # runs after the request, hence the backend passed in
+        body = []
+        for chunk in chunks:
+            body.append(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+        self._store(backend, key, versions, content_type, b"".join(body))
+
+    # Caches a GET view. Tags are formatted with the view arguments,
+    # e.g. @response_cache.cached("venue:{venue_id}", "artists")
+    def cached(self, *tags):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying flashed messages are personal, never cache them
+                if not self.enabled or request.method != "GET" or session.get("_flashes"):
+                    return view(**kwargs)
+                state = self.state
+                key = "page:" + request.full_path
+                # versions are read before rendering, so a write committed
+                # while the page renders leaves the stored entry stale
+                entry_tags = [tag.format(**kwargs) for tag in tags]
+                versions = {tag: self._version(tag) for tag in entry_tags}
+                entry = state.backend.get(key)
+                if entry is not None and entry["versions"] == versions:
+                    state.hits += 1
+                    response = make_response(entry["body"], entry["status"], entry["headers"])
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+                state.misses += 1
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and response.is_streamed:
+                    # streamed pages are stored once their last chunk went out
+                    response.response = self._store_streamed(
+                        state.backend, key, versions, response.headers["Content-Type"],
+                        response.response,
+                    )
+                elif response.status_code == 200 and not response.direct_passthrough:
+                    self._store(
+                        state.backend, key, versions, response.headers["Content-Type"],
+                        response.get_data(),
+                    )
+                response.headers["X-Cache"] = "MISS"
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+# This function refuses to start `workers` server processes on the "memory"
+# backend: a write would only invalidate the pages of the process that
+# handled it, the others would keep serving theirs (see gunicorn.conf.py and
+# asgi.py)
+
+
+def check_workers(backend, workers):
+    if workers > 1 and backend == "memory":
+        raise RuntimeError(
+            'RESPONSE_CACHE = "memory" is per process, use "disk" with more than one worker'
+        )
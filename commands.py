@@ -0,0 +1,140 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from assets import build_assets
+from cache import response_cache
+from models import db
+import counters
+import exporter
+import importer
+
+# `flask fyyur ...` maintenance commands
+
+fyyur_cli = AppGroup("fyyur", help="Fyyur data management commands.")
+
+
+@fyyur_cli.command("import")
+@click.argument("entity", type=click.Choice(sorted(importer.ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "jsonl"]),
+              help="Input format, guessed from the file extension by default.")
+@click.option("--batch-size", default=importer.BATCH_SIZE, show_default=True,
+              help="Records validated and committed per transaction.")
+@click.option("--restart", is_flag=True,
+              help="Ignore the checkpoint of an earlier run and start from the first record.")
+def import_command(entity, path, file_format, batch_size, restart):
+    """Bulk import venues, artists or shows from a CSV or JSONL file.
+
+    An interrupted import resumes after the last committed batch when run
+    again with the same file.
+    """
+
+    def progress(result):
+        if result.skipped and result.read <= batch_size:
+            click.echo(f"resuming after record {result.skipped}")
+        click.echo(
+            f"{entity}: {result.skipped + result.read} records, {result.imported} imported, "
+            f"{result.rejected} rejected ({result.rate:.0f} records/s)"
+        )
+
+    def reject(number, reason):
+        click.echo(f"record {number}: {reason}", err=True)
+
+    try:
+        result = importer.import_file(
+            path, entity, file_format, batch_size, restart, progress=progress, reject=reject
+        )
+    except Exception as error:
+        db.session.rollback()
+        raise click.ClickException(
+            f"import stopped ({error}); run the command again to resume after the last committed batch"
+        )
+    if result is None:
+        click.echo(f"{path} was already imported into {entity}, use --restart to import it again")
+
+
+@fyyur_cli.command("export")
+@click.argument("entity", type=click.Choice(sorted(importer.ENTITIES)))
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True),
+              help="File to write, standard output by default.")
+@click.option("--format", "file_format", type=click.Choice(exporter.FORMATS),
+              help="Output format, guessed from the output file name (csv by default).")
+@click.option("--gzip", "compress", is_flag=True,
+              help="Compress the output, implied by an output file name ending in .gz.")
+def export_command(entity, output, file_format, compress):
+    """Stream venues, artists or shows out as CSV or JSONL."""
+    name = (output or "").lower()
+    compress = compress or name.endswith(".gz")
+    if file_format is None:
+        file_format = "jsonl" if name.removesuffix(".gz").endswith(".jsonl") else "csv"
+    started = time.perf_counter()
+    written = 0
+    with click.open_file(output or "-", "wb") as target:
+        for chunk in exporter.export_chunks(entity, file_format, compress):
+            target.write(chunk)
+            written += len(chunk)
+    if output:
+        click.echo(
+            f"wrote {written} bytes of {entity} to {output} in {time.perf_counter() - started:.1f}s",
+            err=True,
+        )
+
+
+@fyyur_cli.command("refresh-counts")
+def refresh_counts_command():
+    """Recompute the upcoming show counters of venues and artists.
+
+    Shows that started since the last run are aged out of the counters.
+    Meant to be scheduled, e.g. every 15 minutes from cron.
+    """
+    updated = {model.__tablename__: counters.refresh_all_counts(model) for model in counters.COUNTED}
+    db.session.commit()
+    if any(updated.values()):
+        response_cache.invalidate("venues", "artists")
+    click.echo(", ".join(f"{count} {table} updated" for table, count in updated.items()))
+
+
+@fyyur_cli.command("check-counts")
+@click.option("--limit", default=20, show_default=True, help="Drifted rows listed per table.")
+def check_counts_command(limit):
+    """Report venues and artists whose upcoming show counter has drifted.
+
+    Counters that only still include shows that started since the last
+    refresh-counts are counted apart; the next refresh ages them out.
+    Exits with status 1 when any other counter disagrees with the shows table.
+    """
+    drifted = 0
+    for model in counters.COUNTED:
+        table = model.__tablename__
+        since = counters.last_refresh(model)
+        count = 0
+        for row_id, stored, actual in counters.counter_drift(model, since=since):
+            count += 1
+            if count <= limit:
+                click.echo(f"{table} {row_id}: counter {stored}, actual {actual}")
+        if count > limit:
+            click.echo(f"... {count - limit} more {table}")
+        click.echo(f"{table}: {count} drifted")
+        if since is None:
+            click.echo(f"{table}: never refreshed, shows that started count as drift")
+        else:
+            aged = counters.aged_counter_count(model, since)
+            click.echo(f"{table}: {aged} only off by shows started since the refresh of {since:%Y-%m-%d %H:%M}")
+        drifted += count
+    if drifted:
+        raise click.exceptions.Exit(1)
+
+
+@fyyur_cli.command("assets")
+@click.option("--prune", is_flag=True, help="Delete the files of earlier builds.")
+def assets_command(prune):
+    """Build the bundled, minified and hashed static assets into static/dist.
+
+    Run on every deploy; the layout links the files of the latest build.
+    """
+    for asset in build_assets(current_app, prune):
+        sizes = ", ".join(f"{encoding} {size}" for encoding, size in asset.compressed.items())
+        click.echo(f"{asset.name} -> {asset.hashed_name} ({asset.size} bytes{', ' + sizes if sizes else ''})")
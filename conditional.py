@@ -0,0 +1,165 @@
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from flask import make_response, request, session
+from sqlalchemy import func, select
+
+from assets import BUNDLES, assets
+from models import db, Artist, Deletion, Show, Venue
+
+# Conditional GET for the read pages.
+#
+# Before a page is rendered, one query reads its version: the updated_at of
+# the rows it shows (see models.py for how they are kept current), the last
+# deletion from their tables and, on the detail pages, the start of the last
+# show that started (shows move from upcoming to past). The version is sent
+# as a weak ETag, and its latest time as Last-Modified. A request whose
+# If-None-Match (or, when it has none, If-Modified-Since) still matches gets a
+# 304 without the page's queries being run or its template rendered. The
+# hashed asset names are part of the ETag, so a new asset build changes every
+# page.
+#
+# Pages are sent with Cache-Control: no-cache, browsers and proxies keep them
+# but revalidate on each use.
+
+
+class PageVersion:
+    def __init__(self, parts):
+        # naive local times like the updated_at columns, None for no rows
+        self.parts = tuple(parts)
+        times = [part for part in self.parts if part is not None]
+        self.last_modified = max(times) if times else None
+
+    @property
+    def etag(self):
+        bundles = [assets.manifest.get(name, name) for name in BUNDLES]
+        key = repr((request.endpoint, self.parts, bundles)).encode()
+        return hashlib.sha1(key).hexdigest()
+
+    @property
+    def last_modified_utc(self):
+        if self.last_modified is None:
+            return None
+        return self.last_modified.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _not_modified(version):
+    # If-Modified-Since is ignored when If-None-Match is given (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(version.etag)
+    last_modified = version.last_modified_utc
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+# Makes a GET view conditional. `version` is called with the view arguments
+# and returns the page's PageVersion, or None to render the page as usual
+# (e.g. a missing venue, to get the view's 404),
+# e.g. @conditional(venue_version)
+def conditional(version):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flashed messages are personal, as for the response cache
+            if request.method not in ("GET", "HEAD") or session.get("_flashes"):
+                return view(**kwargs)
+            current = version(**kwargs)
+            if current is None:
+                return view(**kwargs)
+            if _not_modified(current):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(current.etag, weak=True)
+            if current.last_modified is not None:
+                response.last_modified = current.last_modified_utc
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+#  Versions
+#  ----------------------------------------------------------------
+
+
+def _latest(column):
+    # through the updated_at index
+    return select(func.max(column)).scalar_subquery()
+
+
+def _deleted_at(model):
+    return (
+        select(Deletion.deleted_at)
+        .where(Deletion.table_name == model.__tablename__)
+        .scalar_subquery()
+    )
+
+
+# This function returns the version of a venue or artist page: the row's
+# updated_at (touched by its edits and by its shows being added or removed),
+# the latest updated_at of the counterparts its shows list, and the start of
+# its last show that started
+
+
+def _detail_version(model, counterpart, owner_column, counterpart_column, entity_id):
+    now = datetime.now()
+    counterparts = (
+        select(func.max(counterpart.updated_at))
+        .select_from(Show)
+        .join(counterpart, counterpart.id == counterpart_column)
+        .where(owner_column == entity_id)
+        .scalar_subquery()
+    )
+    # through the (venue_id|artist_id, start_time) index
+    last_started = (
+        select(func.max(Show.start_time))
+        .where(owner_column == entity_id, Show.start_time <= now)
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        select(model.updated_at, counterparts, last_started).where(model.id == entity_id)
+    ).first()
+    return None if row is None else PageVersion(row)
+
+
+def venue_version(venue_id):
+    return _detail_version(Venue, Artist, Show.venue_id, Show.artist_id, venue_id)
+
+
+def artist_version(artist_id):
+    return _detail_version(Artist, Venue, Show.artist_id, Show.venue_id, artist_id)
+
+
+def _listing_version(*columns):
+    return PageVersion(db.session.execute(select(*columns)).one())
+
+
+def venues_version():
+    # names and upcoming counters of the venues
+    return _listing_version(_latest(Venue.updated_at), _deleted_at(Venue))
+
+
+def artists_version():
+    return _listing_version(_latest(Artist.updated_at), _deleted_at(Artist))
+
+
+def shows_version():
+    # the shows with the names and images of their venues and artists
+    return _listing_version(
+        _latest(Show.updated_at), _deleted_at(Show),
+        _latest(Venue.updated_at), _latest(Artist.updated_at),
+    )
+
+
+def calendar_version():
+    # without a date the calendar shows the current week or month, which
+    # changes at midnight
+    version = shows_version()
+    return PageVersion(version.parts + (datetime.combine(date.today(), time()),))
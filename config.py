@@ -3,10 +3,81 @@ SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Enable debug mode with FLASK_DEBUG=true.
+DEBUG = env_flag("FLASK_DEBUG")
 
 # Connect to the database
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    "DATABASE_URL", "postgresql://postgres@localhost:5432/fyyur"
+).replace("postgres://", "postgresql://", 1)
+
+# Optional read replica: GET requests read from it, see routing.py
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+SQLALCHEMY_BINDS = {"replica": DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+# how long a user's reads stay on the primary after they wrote (cover the
+# replication lag), and how long an unreachable replica is skipped
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+REPLICA_RETRY_SECONDS = int(os.environ.get("REPLICA_RETRY_SECONDS", 30))
+
+# Connection pool and session settings, applied to server databases by
+# models.setup_db (SQLite files use no pool). DB_STATEMENT_TIMEOUT is in
+# milliseconds, 0 for none. Size the pool so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the server's
+# max_connections; /metrics/pool shows how much of it is used.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 0))
+DB_APPLICATION_NAME = os.environ.get("DB_APPLICATION_NAME", "fyyur")
+
+# Threads running the form handlers under ASGI (asgi.py), reads are served
+# on the event loop
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 16))
+
+# Listing and search pages are paginated with keyset cursors
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# shows listed in a day of /shows/calendar, the rest are linked to
+CALENDAR_SHOWS_PER_DAY = 5
+
+# Response cache for the read pages: "memory" (per-process LRU, for a single
+# process only: other processes would not see a write's invalidation, and
+# gunicorn and asgi.py refuse to start with it and more than one worker),
+# "disk" (shared by every worker using RESPONSE_CACHE_DIR) or None to disable
+RESPONSE_CACHE = None
+RESPONSE_CACHE_TTL = 300
+RESPONSE_CACHE_MAXSIZE = 1024
+RESPONSE_CACHE_DIR = os.path.join(basedir, ".cache", "responses")
+
+# Per-request SQL instrumentation (Server-Timing header, /debug/perf in debug
+# mode). Set SQL_STRICT_MAX_DUPLICATES to an int to raise RepeatedQueryError
+# when one parameterized statement runs more often than that in a request.
+SQL_STRICT_MAX_DUPLICATES = None
+PERF_RECENT_REQUESTS = 100
+# Serve the connection pool metrics as JSON on /metrics/pool
+POOL_METRICS_ENDPOINT = env_flag("POOL_METRICS_ENDPOINT")
+
+# Render the /venues, /artists and /shows listings with stream_template, so
+# the layout is sent before the rows are fetched, instead of in one piece
+STREAM_TEMPLATES = False
+
+# Cache lifetime of the hashed files built by `flask fyyur assets` (see
+# assets.py), served as immutable
+STATIC_ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Bearer token for the /export/<entity>.<csv|jsonl> downloads; the route is
+# disabled when it is not set
+EXPORT_TOKEN = os.environ.get("EXPORT_TOKEN")
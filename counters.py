@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from models import db, Artist, CounterRefresh, Show, Venue
+
+# Denormalized upcoming-show counters (Venue/Artist.upcoming_shows_count).
+#
+# The listing and search pages read the counter instead of counting shows.
+# ORM inserts and deletes of shows move the counters of their venue and
+# artist in the same transaction, once per flush (see models.py). Shows written with
+# Core (the bulk importer, the benchmark seeder) call refresh_upcoming_counts
+# for the ids they touched. Shows that start are aged out by the scheduled
+# `flask fyyur refresh-counts`, so between two runs a counter can still
+# include shows that started since the last one. Each run records its time in
+# counter_refreshes, and `flask fyyur check-counts` reports those counters
+# apart from the ones that really drifted.
+
+COUNTED = (Venue, Artist)
+
+
+def _owner_column(model):
+    return Show.venue_id if model is Venue else Show.artist_id
+
+
+def actual_count(model, now):
+    # correlated count through the (venue_id|artist_id, start_time) index
+    return (
+        select(func.count())
+        .where(_owner_column(model) == model.id, Show.start_time > now)
+        .scalar_subquery()
+    )
+
+
+# This function recomputes the counters of `model` as of `now`, for the given
+# ids or all rows, and only writes the rows whose counter changed. Returns the
+# number of rows updated.
+
+
+def refresh_upcoming_counts(model, ids=None, now=None):
+    now = now or datetime.now()
+    actual = actual_count(model, now)
+    statement = (
+        model.__table__.update()
+        .where(model.upcoming_shows_count != actual)
+        .values(upcoming_shows_count=actual)
+    )
+    if ids is not None:
+        statement = statement.where(model.id.in_(ids))
+    return db.session.execute(statement).rowcount
+
+
+# This function recomputes all the counters of `model` like
+# refresh_upcoming_counts and records the time of the refresh. Returns the
+# number of rows updated.
+
+
+def refresh_all_counts(model, now=None):
+    now = now or datetime.now()
+    updated = refresh_upcoming_counts(model, now=now)
+    db.session.merge(CounterRefresh(table_name=model.__tablename__, refreshed_at=now))
+    return updated
+
+
+def last_refresh(model):
+    refresh = db.session.get(CounterRefresh, model.__tablename__)
+    return refresh.refreshed_at if refresh else None
+
+
+def _disagreeing(model, now):
+    actual = actual_count(model, now)
+    query = (
+        db.session.query(model.id, model.upcoming_shows_count, actual.label("actual"))
+        .filter(model.upcoming_shows_count != actual)
+    )
+    return query, actual
+
+
+# a counter above the actual count but no higher than the count as of the
+# last refresh only still includes shows that started since then
+def _aged(model, actual, since):
+    return model.upcoming_shows_count.between(actual, actual_count(model, since))
+
+
+# This function yields (id, stored, actual) for every row of `model` whose
+# counter disagrees with its shows. With `since`, the time of the last
+# refresh, counters that only still include shows that started after it are
+# left out (see aged_counter_count).
+
+
+def counter_drift(model, now=None, since=None):
+    now = now or datetime.now()
+    query, actual = _disagreeing(model, now)
+    if since is not None:
+        query = query.filter(~_aged(model, actual, since))
+    return query.order_by(model.id).yield_per(1000)
+
+
+# This function counts the rows of `model` whose counter is only off by shows
+# that started after `since`, which the next refresh ages out
+
+
+def aged_counter_count(model, since, now=None):
+    now = now or datetime.now()
+    query, actual = _disagreeing(model, now)
+    return query.filter(_aged(model, actual, since)).count()
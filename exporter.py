@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import zlib
+from datetime import timedelta
+
+from importer import ENTITIES
+from models import db, Artist, Show, Venue, genre_names_by_id, in_batches
+
+# Streaming export of venues, artists and shows as CSV or JSONL
+# (`flask fyyur export` and /export/<entity>.<format>).
+#
+# Rows come off a server-side cursor (yield_per) and are encoded a batch at a
+# time, optionally through an incremental gzip compressor, so memory use does
+# not depend on the size of the table. Columns are the ones `flask fyyur
+# import` reads, with genres and the artist/venue names of shows joined in,
+# so a dump can be imported again.
+
+BATCH_SIZE = 1000
+FORMATS = ("csv", "jsonl")
+# the ShowForm format, which the importer validates against
+START_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def columns(entity_name):
+    if entity_name == "shows":
+        return ["artist_id", "artist_name", "venue_id", "venue_name", "start_time", "duration"]
+    return ["id"] + list(ENTITIES[entity_name].columns) + ["genres"]
+
+
+def _entity_batches(entity_name):
+    entity = ENTITIES[entity_name]
+    table = entity.model.__table__
+    rows = (
+        db.session.query(table.c.id, *[
+            table.c[column].label(field) for field, column in entity.columns.items()
+        ])
+        .order_by(table.c.id)
+        .yield_per(BATCH_SIZE)
+    )
+    for batch in in_batches(rows, BATCH_SIZE):
+        genres = genre_names_by_id(entity.model, [row.id for row in batch])
+        items = []
+        for row in batch:
+            item = row._asdict()
+            item["genres"] = genres.get(row.id, [])
+            items.append(item)
+        yield items
+
+
+def _show_batches():
+    rows = (
+        db.session.query(
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.start_time,
+            Show.end_time,
+        )
+        .join(Artist, Artist.id == Show.artist_id)
+        .join(Venue, Venue.id == Show.venue_id)
+        .order_by(Show.start_time, Show.artist_id, Show.venue_id)
+        .yield_per(BATCH_SIZE)
+    )
+    for batch in in_batches(rows, BATCH_SIZE):
+        items = []
+        for row in batch:
+            item = row._asdict()
+            item["start_time"] = row.start_time.strftime(START_TIME_FORMAT)
+            # in minutes, like the show form
+            item["duration"] = (item.pop("end_time") - row.start_time) // timedelta(minutes=1)
+            items.append(item)
+        yield items
+
+
+def _csv_chunks(fields, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in batches:
+        for item in batch:
+            writer.writerow([
+                ",".join(item[field]) if field == "genres" else item[field] for field in fields
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _jsonl_chunks(batches):
+    for batch in batches:
+        yield "".join(json.dumps(item) + "\n" for item in batch)
+
+
+def gzip_chunks(chunks):
+    # one gzip stream (wbits 31) compressed incrementally, data is passed on
+    # whenever the compressor has output ready
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# This function yields the export of `entity_name` as encoded chunks of one
+# batch of rows each, gzip-compressed when `compress` is set
+
+
+def export_chunks(entity_name, file_format, compress=False):
+    batches = _show_batches() if entity_name == "shows" else _entity_batches(entity_name)
+    if file_format == "csv":
+        chunks = _csv_chunks(columns(entity_name), batches)
+    else:
+        chunks = _jsonl_chunks(batches)
+    chunks = (chunk.encode() for chunk in chunks)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+# Pre-fork server settings: gunicorn -c gunicorn.conf.py
+#
+# The app is imported and created once in the master (preload_app) and the
+# workers are forked from it, sharing the loaded code. Engines hold no
+# connections until first use; post_fork still drops whatever the master may
+# have pooled so that no connection is shared between processes, and each
+# worker warms up before it accepts its first request.
+#
+# Scale with WEB_CONCURRENCY (worker processes, one per core by default) and
+# GUNICORN_THREADS (threads per worker). Every worker has its own pool: keep
+# WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the database's
+# max_connections, and GUNICORN_THREADS at most DB_POOL_SIZE + DB_MAX_OVERFLOW.
+
+wsgi_app = "wsgi:application"
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = True
+
+# the "memory" response cache lives in each worker
+if workers > 1:
+    from cache import check_workers
+    from config import RESPONSE_CACHE
+
+    check_workers(RESPONSE_CACHE, workers)
+
+# recycle workers now and then, jittered so they do not restart together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")
+errorlog = "-"
+
+
+def when_ready(server):
+    # templates compiled in the master are inherited by every worker
+    if server.cfg.preload_app:
+        from app import warmup
+
+        warmup(server.app.wsgi(), connect=False)
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from models import db
+
+        db.dispose_engines(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # runs in the worker before it accepts connections
+    from app import warmup
+
+    warmup(worker.wsgi)
@@ -0,0 +1,402 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from itertools import count as counter, islice
+
+from sqlalchemy import func
+from werkzeug.datastructures import MultiDict
+
+from cache import response_cache
+from counters import refresh_upcoming_counts
+from models import (
+    db, Artist, Genre, ImportCheckpoint, Show, Venue, artist_genres, touch, venue_genres
+)
+from schedule import booked_slots, overlaps, show_end_time
+
+# Bulk import of venues, artists and shows from CSV or JSONL (`flask fyyur import`).
+#
+# Records are read in batches. Each batch is validated with the same forms as
+# the create pages, its foreign keys and genres are resolved with one query per
+# kind, and its rows are written with bulk inserts (COPY on PostgreSQL). The
+# batch commits together with its checkpoint, so a failed import run again
+# picks up after the last committed batch.
+#
+# Columns are named like the form fields. Venues and artists may carry an
+# "id" for shows to refer to; shows give either artist_id/venue_id or
+# artist_name/venue_name, and a duration in minutes (2 hours by default).
+# Shows overlapping another show of their artist or venue are rejected. Genres are a list in JSONL and comma separated in CSV.
+
+BATCH_SIZE = 1000
+TRUE_VALUES = ("1", "true", "t", "yes", "y", "on")
+
+
+class Entity:
+    def __init__(self, model, form_name, columns, link_table=None, link_fk=None):
+        self.model = model
+        self.form_name = form_name
+        # form field -> table column
+        self.columns = columns
+        self.link_table = link_table
+        self.link_fk = link_fk
+
+    @property
+    def form_class(self):
+        # forms (flask_wtf, wtforms) are only imported once records are
+        # validated, not by every process that loads the CLI commands
+        import forms
+
+        return getattr(forms, self.form_name)
+
+
+ENTITIES = {
+    "venues": Entity(
+        Venue, "VenueForm",
+        {
+            "name": "name", "city": "city", "state": "state", "address": "address",
+            "phone": "phone", "image_link": "image_link", "facebook_link": "facebook_link",
+            "website_link": "website_link", "seeking_talent": "searching_talent",
+            "seeking_description": "seeking_description",
+        },
+        venue_genres, "venue_id",
+    ),
+    "artists": Entity(
+        Artist, "ArtistForm",
+        {
+            "name": "name", "city": "city", "state": "state", "phone": "phone",
+            "image_link": "image_link", "facebook_link": "facebook_link",
+            "website_link": "website_link", "seeking_venue": "searching_venue",
+            "seeking_description": "seeking_description",
+        },
+        artist_genres, "artist_id",
+    ),
+    "shows": Entity(
+        Show, "ShowForm",
+        {"artist_id": "artist_id", "venue_id": "venue_id", "start_time": "start_time"},
+    ),
+}
+
+BOOLEAN_FIELDS = ("seeking_talent", "seeking_venue")
+
+
+class ImportResult:
+    def __init__(self, skipped=0):
+        self.skipped = skipped
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        return self.read / max(time.perf_counter() - self.started, 1e-9)
+
+
+# This function yields (record number, dict) from a CSV or JSONL file
+
+
+def read_records(path, file_format):
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            for number, record in enumerate(csv.DictReader(source), 1):
+                if record.get("genres"):
+                    record["genres"] = [name.strip() for name in record["genres"].split(",")]
+                yield number, record
+        else:
+            number = 0
+            for line in source:
+                if line.strip():
+                    number += 1
+                    yield number, json.loads(line)
+
+
+def _formdata(record):
+    formdata = MultiDict()
+    for field, value in record.items():
+        if value is None or value == "":
+            continue
+        if field in BOOLEAN_FIELDS:
+            # BooleanField reads any non-empty string as true
+            if value is True or str(value).strip().lower() in TRUE_VALUES:
+                formdata.add(field, "y")
+        elif isinstance(value, list):
+            for item in value:
+                formdata.add(field, str(item))
+        else:
+            formdata.add(field, str(value))
+    return formdata
+
+
+def _form_errors(form):
+    return "; ".join(f"{field}: {messages[0]}" for field, messages in form.errors.items())
+
+
+def _is_postgresql():
+    return db.session.connection().dialect.name == "postgresql"
+
+
+def _copy_rows(table, rows):
+    # COPY ... FROM STDIN in the session's transaction; \N marks NULL
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(table, rows):
+    if not rows:
+        return
+    if _is_postgresql():
+        _copy_rows(table, rows)
+    else:
+        db.session.execute(table.insert(), rows)
+
+
+# This function hands out `count` new primary keys for the table, so that
+# rows (and their genre links) can be bulk inserted with explicit ids. The ids
+# in `exclude` (given explicitly by other records of the batch, not inserted
+# yet) are skipped.
+
+
+def reserve_ids(model, count, exclude=()):
+    if not count:
+        return []
+    table = model.__table__
+    if _is_postgresql():
+        ids = db.session.execute(
+            db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                    "FROM generate_series(1, :count)"),
+            {"table": table.name, "count": count + len(exclude)},
+        ).scalars()
+    else:
+        ids = counter((db.session.query(func.max(model.id)).scalar() or 0) + 1)
+    return list(islice((row_id for row_id in ids if row_id not in exclude), count))
+
+
+def _sync_sequence(model):
+    # explicit ids bypass the sequence, move it past them
+    if _is_postgresql():
+        table = model.__table__.name
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {table}))"
+        ))
+
+
+def _genre_ids(names):
+    existing = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), [{"name": name} for name in missing])
+        existing.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(missing)))
+    return existing
+
+
+def _import_entities(entity, batch, reject):
+    model = entity.model
+    explicit_ids = [int(record["id"]) for _, record in batch if str(record.get("id", "")).isdigit()]
+    taken = set()
+    if explicit_ids:
+        taken = {row_id for row_id, in db.session.query(model.id).filter(model.id.in_(explicit_ids))}
+
+    rows, genres, seen_ids = [], [], set()
+    # COPY does not apply the column's Python default
+    now = datetime.now()
+    for number, record in batch:
+        form = entity.form_class(formdata=_formdata(record), meta={"csrf": False})
+        if not form.validate():
+            reject(number, _form_errors(form))
+            continue
+        row_id = record.get("id")
+        if row_id in (None, ""):
+            row_id = None
+        elif not str(row_id).isdigit():
+            reject(number, "id: Not a valid integer")
+            continue
+        else:
+            row_id = int(row_id)
+        if row_id is not None and (row_id in taken or row_id in seen_ids):
+            reject(number, f"id: {row_id} already exists")
+            continue
+        if row_id is not None:
+            seen_ids.add(row_id)
+        rows.append({column: form[field].data for field, column in entity.columns.items()})
+        rows[-1]["id"] = row_id
+        rows[-1]["updated_at"] = now
+        genres.append(form.genres.data)
+
+    new_ids = iter(reserve_ids(model, sum(1 for row in rows if row["id"] is None), seen_ids))
+    for row in rows:
+        if row["id"] is None:
+            row["id"] = next(new_ids)
+    genre_ids = _genre_ids(sorted({name for names in genres for name in names}))
+    bulk_insert(model.__table__, rows)
+    bulk_insert(entity.link_table, [
+        {entity.link_fk: row["id"], "genre_id": genre_ids[name]}
+        for row, names in zip(rows, genres)
+        for name in dict.fromkeys(names)
+    ])
+    if explicit_ids:
+        _sync_sequence(model)
+    # with the response cache tags of the pages the batch changed
+    return len(rows), [model.__tablename__]
+
+
+def _resolve_names(model, names):
+    # lower(name) -> id, through the lower(name) index; ambiguous names map to None
+    if not names:
+        return {}
+    resolved = {}
+    lowered = func.lower(model.name)
+    for name, row_id in db.session.query(lowered, model.id).filter(lowered.in_(names)):
+        resolved[name] = None if name in resolved else row_id
+    return resolved
+
+
+def _import_shows(entity, batch, reject):
+    artist_names = _resolve_names(Artist, sorted({
+        record["artist_name"].lower() for _, record in batch
+        if not record.get("artist_id") and isinstance(record.get("artist_name"), str)
+    }))
+    venue_names = _resolve_names(Venue, sorted({
+        record["venue_name"].lower() for _, record in batch
+        if not record.get("venue_id") and isinstance(record.get("venue_name"), str)
+    }))
+
+    candidates = []
+    now = datetime.now()
+    for number, record in batch:
+        record = dict(record)
+        problem = None
+        for key, names in (("artist", artist_names), ("venue", venue_names)):
+            name = record.get(f"{key}_name")
+            if not record.get(f"{key}_id") and name:
+                if not isinstance(name, str):
+                    problem = problem or f"{key}_name: Not a valid name"
+                    continue
+                record[f"{key}_id"] = names.get(name.lower())
+                if record[f"{key}_id"] is None:
+                    problem = problem or f"{key}_name: {name!r} is unknown or ambiguous"
+        if problem:
+            reject(number, problem)
+            continue
+        form = entity.form_class(formdata=_formdata(record), meta={"csrf": False})
+        if not form.validate():
+            reject(number, _form_errors(form))
+            continue
+        start_time = form.start_time.data
+        candidates.append((number, {
+            "artist_id": form.artist_id.data,
+            "venue_id": form.venue_id.data,
+            "start_time": start_time,
+            "end_time": show_end_time(start_time, form.duration.data),
+            "updated_at": now,
+        }))
+
+    # foreign keys, one query each
+    artist_ids = {row_id for row_id, in db.session.query(Artist.id).filter(
+        Artist.id.in_({show["artist_id"] for _, show in candidates}))}
+    venue_ids = {row_id for row_id, in db.session.query(Venue.id).filter(
+        Venue.id.in_({show["venue_id"] for _, show in candidates}))}
+
+    # (owner, id) -> [(start_time, end_time)] booked around the batch's shows,
+    # one range query per artist or venue (see schedule.booked_slots)
+    booked = {}
+    for owner, owner_column in (("artist", Show.artist_id), ("venue", Show.venue_id)):
+        windows = {}
+        for _, show in candidates:
+            owner_id = show[f"{owner}_id"]
+            earliest, latest = windows.get(owner_id, (show["start_time"], show["end_time"]))
+            windows[owner_id] = (min(earliest, show["start_time"]), max(latest, show["end_time"]))
+        for owner_id, start_time, end_time in booked_slots(owner_column, windows):
+            booked.setdefault((owner, owner_id), []).append((start_time, end_time))
+
+    rows = []
+    for number, show in candidates:
+        slot = (show["start_time"], show["end_time"])
+        taken = [
+            (owner, show[f"{owner}_id"]) for owner in ("artist", "venue")
+            if any(overlaps(*slot, *other) for other in booked.get((owner, show[f"{owner}_id"]), ()))
+        ]
+        if show["artist_id"] not in artist_ids:
+            reject(number, f"artist_id: {show['artist_id']} does not exist")
+        elif show["venue_id"] not in venue_ids:
+            reject(number, f"venue_id: {show['venue_id']} does not exist")
+        elif taken:
+            reject(number, f"{taken[0][0]} {taken[0][1]} already has a show at that time")
+        else:
+            # later records of the batch are checked against this one too
+            for owner in ("artist", "venue"):
+                booked.setdefault((owner, show[f"{owner}_id"]), []).append(slot)
+            rows.append(show)
+    bulk_insert(Show.__table__, rows)
+    # Core inserts bypass the ORM events touching the venues and artists and
+    # moving their counters
+    touch(Venue, {row["venue_id"] for row in rows})
+    touch(Artist, {row["artist_id"] for row in rows})
+    refresh_upcoming_counts(Venue, {row["venue_id"] for row in rows})
+    refresh_upcoming_counts(Artist, {row["artist_id"] for row in rows})
+    tags = ["shows"]
+    tags += [f"venue:{venue_id}" for venue_id in sorted({row["venue_id"] for row in rows})]
+    tags += [f"artist:{artist_id}" for artist_id in sorted({row["artist_id"] for row in rows})]
+    return len(rows), tags
+
+
+# This function imports `path` into `entity_name`, calling `progress` with the
+# running ImportResult after every committed batch and `reject` with the
+# record number and reason of every invalid record
+
+
+def import_file(path, entity_name, file_format=None, batch_size=BATCH_SIZE,
+                restart=False, progress=None, reject=None):
+    entity = ENTITIES[entity_name]
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    source = f"{entity_name}:{os.path.abspath(path)}"
+    checkpoint = db.session.get(ImportCheckpoint, source)
+    if checkpoint is None or restart:
+        checkpoint = db.session.merge(ImportCheckpoint(
+            source=source, records_done=0, finished=False, updated_at=datetime.now()
+        ))
+    if checkpoint.finished:
+        return None
+
+    result = ImportResult(skipped=checkpoint.records_done)
+
+    def rejected(number, reason):
+        result.rejected += 1
+        if reject:
+            reject(number, reason)
+
+    import_batch = _import_shows if entity_name == "shows" else _import_entities
+    records = islice(read_records(path, file_format), checkpoint.records_done, None)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        imported, tags = import_batch(entity, batch, rejected)
+        checkpoint.records_done = batch[-1][0]
+        checkpoint.updated_at = datetime.now()
+        db.session.commit()
+        if imported:
+            response_cache.invalidate(*tags)
+        result.read += len(batch)
+        result.imported += imported
+        if progress:
+            progress(result)
+
+    checkpoint.finished = True
+    checkpoint.updated_at = datetime.now()
+    db.session.commit()
+    return result
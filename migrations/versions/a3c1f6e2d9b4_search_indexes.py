@@ -0,0 +1,74 @@
+"""Search indexes for venues and artists.
+
+Revision ID: a3c1f6e2d9b4
+Revises: 52a23a1a7856
+Create Date: 2026-10-18 10:02:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c1f6e2d9b4'
+down_revision = '52a23a1a7856'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('venues', 'artists')
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        document = " || ' ' || ".join(
+            "coalesce({}, '')".format(name) for name in SEARCH_COLUMNS)
+        for table in SEARCH_TABLES:
+            op.execute(
+                'ALTER TABLE {0} ADD COLUMN search_vector tsvector '
+                "GENERATED ALWAYS AS (to_tsvector('simple', {1})) STORED"
+                .format(table, document))
+            op.create_index('ix_{}_search_vector'.format(table), table,
+                            ['search_vector'], postgresql_using='gin')
+            op.create_index('ix_{}_name_trgm'.format(table), table, ['name'],
+                            postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'})
+    elif dialect == 'sqlite':
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join('new.' + name for name in SEARCH_COLUMNS)
+        old_values = ', '.join('old.' + name for name in SEARCH_COLUMNS)
+        for table in SEARCH_TABLES:
+            op.execute(
+                'CREATE VIRTUAL TABLE {0}_fts USING fts5({1}, '
+                "content='{0}', content_rowid='id', tokenize='trigram')"
+                .format(table, columns))
+            op.execute(
+                'CREATE TRIGGER {0}_fts_ai AFTER INSERT ON {0} BEGIN '
+                'INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {2}); END'
+                .format(table, columns, new_values))
+            op.execute(
+                'CREATE TRIGGER {0}_fts_ad AFTER DELETE ON {0} BEGIN '
+                "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); END"
+                .format(table, columns, old_values))
+            op.execute(
+                'CREATE TRIGGER {0}_fts_au AFTER UPDATE ON {0} BEGIN '
+                "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); "
+                'INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {3}); END'
+                .format(table, columns, old_values, new_values))
+            op.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCH_TABLES:
+            op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+            op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+            op.drop_column(table, 'search_vector')
+    elif dialect == 'sqlite':
+        for table in SEARCH_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER {}_fts_{}'.format(table, suffix))
+            op.execute('DROP TABLE {}_fts'.format(table))
@@ -0,0 +1,104 @@
+"""Surrogate show ids, end times and overlapping booking constraints.
+
+Revision ID: b6e3d9f4a2c1
+Revises: a8d4f1c2e6b9
+Create Date: 2026-10-18 18:21:40.267315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e3d9f4a2c1'
+down_revision = 'a8d4f1c2e6b9'
+branch_labels = None
+depends_on = None
+
+# existing shows get the default duration
+DEFAULT_DURATION = "2 hours"
+
+EXCLUSIONS = (
+    ('ex_shows_venue_id_overlap', 'venue_id'),
+    ('ex_shows_artist_id_overlap', 'artist_id'),
+)
+
+
+def _shows_table(*columns):
+    # the shows table for batch operations, in place of the reflected one
+    # whose primary key is being replaced
+    return sa.Table(
+        'shows', sa.MetaData(),
+        sa.Column('artist_id', sa.Integer(), sa.ForeignKey('artists.id'), nullable=False),
+        sa.Column('venue_id', sa.Integer(), sa.ForeignKey('venues.id'), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        *columns,
+        sa.Index('ix_shows_start_time_artist_id_venue_id', 'start_time', 'artist_id', 'venue_id'),
+        sa.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        sa.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE shows DROP CONSTRAINT shows_pkey')
+        op.execute('ALTER TABLE shows ADD COLUMN id SERIAL PRIMARY KEY')
+        op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE shows SET end_time = start_time + interval '{DEFAULT_DURATION}'")
+        op.alter_column('shows', 'end_time', nullable=False)
+        op.create_check_constraint('ck_shows_end_after_start', 'shows', 'end_time > start_time')
+        # fails when already listed shows overlap, they have to be moved first
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for name, column in EXCLUSIONS:
+            op.execute(
+                f'ALTER TABLE shows ADD CONSTRAINT {name} EXCLUDE USING gist '
+                f"({column} WITH =, tsrange(start_time, end_time, '[)') WITH &&)"
+            )
+        return
+
+    # SQLite cannot alter a primary key, the table is rebuilt (ids are
+    # assigned by rowid in the order of the copy)
+    with op.batch_alter_table('shows', recreate='always', copy_from=_shows_table()) as batch_op:
+        batch_op.add_column(sa.Column('id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+        batch_op.create_primary_key('pk_shows', ['id'])
+    # keeps the fractional seconds of the stored start_time
+    op.execute(
+        "UPDATE shows SET end_time = strftime('%Y-%m-%d %H:%M:%S', start_time, "
+        f"'+{DEFAULT_DURATION}') || substr(start_time, 20)"
+    )
+    with op.batch_alter_table('shows', recreate='always', copy_from=_shows_table(
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+    )) as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_shows_end_after_start', 'end_time > start_time')
+
+
+def downgrade():
+    # an artist's later shows at the same venue do not fit the (artist_id,
+    # venue_id) key and are dropped, the earliest one is kept
+    op.execute(
+        'DELETE FROM shows WHERE id NOT IN ('
+        'SELECT min(id) FROM shows s WHERE s.start_time = ('
+        'SELECT min(start_time) FROM shows f '
+        'WHERE f.artist_id = s.artist_id AND f.venue_id = s.venue_id) '
+        'GROUP BY s.artist_id, s.venue_id)'
+    )
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        for name, _ in EXCLUSIONS:
+            op.drop_constraint(name, 'shows')
+        op.drop_constraint('ck_shows_end_after_start', 'shows')
+        op.drop_column('shows', 'end_time')
+        op.execute('ALTER TABLE shows DROP CONSTRAINT shows_pkey')
+        op.drop_column('shows', 'id')
+        op.create_primary_key('shows_pkey', 'shows', ['artist_id', 'venue_id'])
+        return
+
+    with op.batch_alter_table('shows', recreate='always') as batch_op:
+        batch_op.drop_constraint('ck_shows_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
+        batch_op.drop_column('id')
+        batch_op.create_primary_key('pk_shows', ['artist_id', 'venue_id'])
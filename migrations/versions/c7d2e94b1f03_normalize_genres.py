@@ -0,0 +1,254 @@
+"""Normalize genres into genres, venue_genres and artist_genres.
+
+Revision ID: c7d2e94b1f03
+Revises: a3c1f6e2d9b4
+Create Date: 2026-10-18 11:24:37.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e94b1f03'
+down_revision = 'a3c1f6e2d9b4'
+branch_labels = None
+depends_on = None
+
+# (entity table, association table, foreign key column)
+GENRE_LINKS = (
+    ('venues', 'venue_genres', 'venue_id'),
+    ('artists', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, link_table, fk in GENRE_LINKS:
+        op.create_table(link_table,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([fk], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.PrimaryKeyConstraint(fk, 'genre_id')
+        )
+        op.create_index(op.f('ix_{}_genre_id'.format(link_table)), link_table,
+                        ['genre_id'], unique=False)
+
+    # data migration: split the ", " joined strings into rows
+    conn = op.get_bind()
+    genres_table = sa.table('genres', sa.column('id'), sa.column('name'))
+    links = {}
+    for table, link_table, fk in GENRE_LINKS:
+        links[table] = [
+            (row.id, [name for name in row.genres.split(', ') if name])
+            for row in conn.execute(sa.text('SELECT id, genres FROM ' + table))
+        ]
+    names = sorted({name for rows in links.values() for _, row_names in rows for name in row_names})
+    if names:
+        op.bulk_insert(genres_table, [{'name': name} for name in names])
+    genre_ids = {row.name: row.id for row in conn.execute(sa.text('SELECT id, name FROM genres'))}
+    for table, link_table, fk in GENRE_LINKS:
+        link_rows = [
+            {fk: entity_id, 'genre_id': genre_ids[name]}
+            for entity_id, row_names in links[table]
+            for name in set(row_names)
+        ]
+        if link_rows:
+            op.bulk_insert(sa.table(link_table, sa.column(fk), sa.column('genre_id')), link_rows)
+
+    # the search indexes read the genres column, rebuild them over the new tables
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        _drop_postgresql_generated_search()
+    elif dialect == 'sqlite':
+        _drop_sqlite_external_content_search()
+    for table, _, _ in GENRE_LINKS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+    if dialect == 'postgresql':
+        _create_postgresql_trigger_search()
+    elif dialect == 'sqlite':
+        _create_sqlite_trigger_search()
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        _drop_postgresql_trigger_search()
+    elif dialect == 'sqlite':
+        _drop_sqlite_trigger_search()
+
+    for table, link_table, fk in GENRE_LINKS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+        genres = {}
+        for row in conn.execute(sa.text(
+                'SELECT l.{0} AS entity_id, g.name FROM {1} l JOIN genres g ON g.id = l.genre_id '
+                'ORDER BY g.name'.format(fk, link_table))):
+            genres.setdefault(row.entity_id, []).append(row.name)
+        for entity_id, names in genres.items():
+            conn.execute(sa.text('UPDATE {} SET genres = :genres WHERE id = :id'.format(table)),
+                         {'genres': ', '.join(names), 'id': entity_id})
+        conn.execute(sa.text("UPDATE {} SET genres = '' WHERE genres IS NULL".format(table)))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('genres', existing_type=sa.String(length=120), nullable=False)
+
+    if dialect == 'postgresql':
+        _create_postgresql_generated_search()
+    elif dialect == 'sqlite':
+        _create_sqlite_external_content_search()
+
+    for table, link_table, fk in GENRE_LINKS:
+        op.drop_index(op.f('ix_{}_genre_id'.format(link_table)), table_name=link_table)
+        op.drop_table(link_table)
+    op.drop_table('genres')
+
+
+# ----------------------------------------------------------------------------#
+# Search index helpers.
+# ----------------------------------------------------------------------------#
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+
+def _genre_names_sql(link_table, fk, entity_id, aggregate):
+    return ('(SELECT {0} FROM {1} l JOIN genres g ON g.id = l.genre_id '
+            'WHERE l.{2} = {3})'.format(aggregate, link_table, fk, entity_id))
+
+
+def _drop_postgresql_generated_search():
+    for table, _, _ in GENRE_LINKS:
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.drop_column(table, 'search_vector')
+
+
+def _create_postgresql_generated_search():
+    document = " || ' ' || ".join(
+        "coalesce({}, '')".format(name) for name in SEARCH_COLUMNS)
+    for table, _, _ in GENRE_LINKS:
+        op.execute(
+            'ALTER TABLE {0} ADD COLUMN search_vector tsvector '
+            "GENERATED ALWAYS AS (to_tsvector('simple', {1})) STORED"
+            .format(table, document))
+        op.create_index('ix_{}_search_vector'.format(table), table,
+                        ['search_vector'], postgresql_using='gin')
+
+
+# A generated column cannot read other tables, so the vector is computed by a
+# BEFORE trigger on the entity, and genre link changes touch the entity row.
+def _create_postgresql_trigger_search():
+    for table, link_table, fk in GENRE_LINKS:
+        genre_names = _genre_names_sql(link_table, fk, 'NEW.id', "string_agg(g.name, ' ')")
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR()))
+        op.execute(
+            'CREATE FUNCTION {0}_search_vector_update() RETURNS trigger AS $$ BEGIN '
+            "NEW.search_vector := to_tsvector('simple', coalesce(NEW.name, '') || ' ' || "
+            "coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '') || ' ' || "
+            "coalesce({1}, '')); RETURN NEW; END $$ LANGUAGE plpgsql"
+            .format(table, genre_names))
+        op.execute(
+            'CREATE TRIGGER {0}_search_vector BEFORE INSERT OR UPDATE ON {0} '
+            'FOR EACH ROW EXECUTE FUNCTION {0}_search_vector_update()'.format(table))
+        op.execute(
+            'CREATE FUNCTION {0}_search_vector_touch() RETURNS trigger AS $$ BEGIN '
+            'UPDATE {1} SET search_vector = NULL WHERE id = coalesce(NEW.{2}, OLD.{2}); '
+            'RETURN NULL; END $$ LANGUAGE plpgsql'.format(link_table, table, fk))
+        op.execute(
+            'CREATE TRIGGER {0}_search_vector AFTER INSERT OR DELETE ON {0} '
+            'FOR EACH ROW EXECUTE FUNCTION {0}_search_vector_touch()'.format(link_table))
+        # fires the BEFORE UPDATE trigger on every existing row
+        op.execute('UPDATE {} SET search_vector = NULL'.format(table))
+        op.create_index('ix_{}_search_vector'.format(table), table,
+                        ['search_vector'], postgresql_using='gin')
+
+
+def _drop_postgresql_trigger_search():
+    for table, link_table, _ in GENRE_LINKS:
+        op.execute('DROP TRIGGER {0}_search_vector ON {0}'.format(link_table))
+        op.execute('DROP FUNCTION {}_search_vector_touch()'.format(link_table))
+        op.execute('DROP TRIGGER {0}_search_vector ON {0}'.format(table))
+        op.execute('DROP FUNCTION {}_search_vector_update()'.format(table))
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.drop_column(table, 'search_vector')
+
+
+def _drop_sqlite_external_content_search():
+    for table, _, _ in GENRE_LINKS:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute('DROP TRIGGER {}_fts_{}'.format(table, suffix))
+        op.execute('DROP TABLE {}_fts'.format(table))
+
+
+def _create_sqlite_external_content_search():
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join('new.' + name for name in SEARCH_COLUMNS)
+    old_values = ', '.join('old.' + name for name in SEARCH_COLUMNS)
+    for table, _, _ in GENRE_LINKS:
+        op.execute(
+            'CREATE VIRTUAL TABLE {0}_fts USING fts5({1}, '
+            "content='{0}', content_rowid='id', tokenize='trigram')"
+            .format(table, columns))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_ai AFTER INSERT ON {0} BEGIN '
+            'INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {2}); END'
+            .format(table, columns, new_values))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_ad AFTER DELETE ON {0} BEGIN '
+            "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); END"
+            .format(table, columns, old_values))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_au AFTER UPDATE ON {0} BEGIN '
+            "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); "
+            'INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {3}); END'
+            .format(table, columns, old_values, new_values))
+        op.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+# The FTS5 table now stores its own copy of the document: the entity triggers
+# maintain name/city/state and the association triggers maintain genres.
+def _create_sqlite_trigger_search():
+    columns = ', '.join(SEARCH_COLUMNS)
+    for table, link_table, fk in GENRE_LINKS:
+        op.execute(
+            "CREATE VIRTUAL TABLE {0}_fts USING fts5({1}, tokenize='trigram')"
+            .format(table, columns))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_ai AFTER INSERT ON {0} BEGIN '
+            "INSERT INTO {0}_fts(rowid, name, city, state, genres) "
+            "VALUES (new.id, new.name, new.city, new.state, ''); END".format(table))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_au AFTER UPDATE ON {0} BEGIN '
+            'UPDATE {0}_fts SET name = new.name, city = new.city, state = new.state '
+            'WHERE rowid = old.id; END'.format(table))
+        op.execute(
+            'CREATE TRIGGER {0}_fts_ad AFTER DELETE ON {0} BEGIN '
+            'DELETE FROM {0}_fts WHERE rowid = old.id; END'.format(table))
+        for event, row in (('ai', 'new'), ('ad', 'old')):
+            genre_names = _genre_names_sql(
+                link_table, fk, '{}.{}'.format(row, fk), "group_concat(g.name, ' ')")
+            op.execute(
+                'CREATE TRIGGER {0}_fts_{1} AFTER {2} ON {0} BEGIN '
+                "UPDATE {3}_fts SET genres = coalesce({4}, '') WHERE rowid = {5}.{6}; END"
+                .format(link_table, event, 'INSERT' if event == 'ai' else 'DELETE',
+                        table, genre_names, row, fk))
+        op.execute(
+            'INSERT INTO {0}_fts(rowid, name, city, state, genres) '
+            "SELECT e.id, e.name, e.city, e.state, coalesce({1}, '') FROM {0} e"
+            .format(table, _genre_names_sql(link_table, fk, 'e.id', "group_concat(g.name, ' ')")))
+
+
+def _drop_sqlite_trigger_search():
+    for table, link_table, _ in GENRE_LINKS:
+        for suffix in ('ai', 'ad'):
+            op.execute('DROP TRIGGER {}_fts_{}'.format(link_table, suffix))
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute('DROP TRIGGER {}_fts_{}'.format(table, suffix))
+        op.execute('DROP TABLE {}_fts'.format(table))
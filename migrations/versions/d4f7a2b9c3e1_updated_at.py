@@ -0,0 +1,56 @@
+"""updated_at on venues, artists and shows and a deletions table, for conditional GETs.
+
+Revision ID: d4f7a2b9c3e1
+Revises: b6e3d9f4a2c1
+Create Date: 2026-10-18 21:47:12.608231
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a2b9c3e1'
+down_revision = 'b6e3d9f4a2c1'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+# lets the NOT NULL column be added to filled tables, the rows are then
+# backfilled; the app always sets updated_at itself
+PLACEHOLDER = '1970-01-01 00:00:00'
+
+
+def upgrade():
+    conn = op.get_bind()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=PLACEHOLDER, nullable=False))
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+    op.create_table('deletions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+    # every page gets a new version once, after which they only change with
+    # the rows they show
+    now = datetime.now()
+    for table in TABLES:
+        conn.execute(sa.text(f"UPDATE {table} SET updated_at = :now"), {"now": now})
+
+    # SQLite cannot drop a column default without rebuilding the table, and
+    # the default is never used there either
+    if conn.dialect.name == 'postgresql':
+        for table in TABLES:
+            op.alter_column(table, 'updated_at', server_default=None)
+
+
+def downgrade():
+    op.drop_table('deletions')
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
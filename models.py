@@ -1,6 +1,100 @@
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event, orm
+from sqlalchemy.orm import validates
+
+from perf import TimedQueuePool
+from routing import RoutingSession
+
+
+# async drivers of the backends, for the requests served on the event loop
+# (see asgi.py)
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+
+def pool_options(config):
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+class FyyurSQLAlchemy(SQLAlchemy):
+    def __init__(self, *args, **kwargs):
+        self._async_engines = {}
+        super().__init__(*args, **kwargs)
+
+    # Applies the DB_* pool and session settings of the config when the
+    # engine is created, so they follow whatever database URI is configured
+    # by then. SQLite keeps Flask-SQLAlchemy's defaults (no pool, no timeouts).
+    def apply_driver_hacks(self, app, sa_url, options):
+        if sa_url.get_backend_name() == "sqlite":
+            return super().apply_driver_hacks(app, sa_url, options)
+        config = app.config
+        options.setdefault("poolclass", TimedQueuePool)
+        for name, value in pool_options(config).items():
+            options.setdefault(name, value)
+        if sa_url.get_backend_name() == "postgresql":
+            connect_args = options.setdefault("connect_args", {})
+            connect_args.setdefault("application_name", config["DB_APPLICATION_NAME"])
+            if config["DB_STATEMENT_TIMEOUT"]:
+                connect_args.setdefault(
+                    "options", f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"
+                )
+        return super().apply_driver_hacks(app, sa_url, options)
 
-db = SQLAlchemy();
+    # This method returns the AsyncEngine reaching the database of `engine`
+    # through the backend's async driver, created on first use with the same
+    # pool and session settings
+    def get_async_engine(self, engine):
+        async_engine = self._async_engines.get(engine.url)
+        if async_engine is None:
+            backend = engine.url.get_backend_name()
+            url = engine.url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+            options = {}
+            if backend != "sqlite":
+                config = current_app.config
+                options.update(pool_options(config))
+                if backend == "postgresql":
+                    settings = {"application_name": config["DB_APPLICATION_NAME"]}
+                    if config["DB_STATEMENT_TIMEOUT"]:
+                        settings["statement_timeout"] = str(config["DB_STATEMENT_TIMEOUT"])
+                    options["connect_args"] = {"server_settings": settings}
+            # only needed (and imported) by the ASGI deployment
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            async_engine = create_async_engine(url, **options)
+            self._async_engines[engine.url] = async_engine
+        return async_engine
+
+    # This method drops the pooled connections of every engine of `app` in a
+    # forked worker. close=False leaves the sockets inherited from the parent
+    # alone (closing them would end the parent's sessions); the worker opens
+    # its own connections from then on.
+    def dispose_engines(self, app):
+        for bind in [None, *app.config["SQLALCHEMY_BINDS"]]:
+            self.get_engine(app, bind=bind).dispose(close=False)
+        for async_engine in self._async_engines.values():
+            async_engine.sync_engine.dispose(close=False)
+        self._async_engines.clear()
+
+    async def dispose_async_engines(self):
+        for async_engine in self._async_engines.values():
+            await async_engine.dispose()
+        self._async_engines.clear()
+
+    # sessions route reads to the replica bind, see routing.py
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = FyyurSQLAlchemy();
 
 
 def setup_db(app):
@@ -8,8 +102,48 @@ def setup_db(app):
     return db
 
 
+# genres are normalized into their own table, linked to venues and artists
+# through association tables indexed on genre_id for genre browsing
+venue_genres = db.Table(
+    "venue_genres",
+    db.Column("venue_id", db.Integer, db.ForeignKey(
+        "venues.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("genre_id", db.Integer, db.ForeignKey(
+        "genres.id"), primary_key=True, index=True),
+)
+
+artist_genres = db.Table(
+    "artist_genres",
+    db.Column("artist_id", db.Integer, db.ForeignKey(
+        "artists.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("genre_id", db.Integer, db.ForeignKey(
+        "genres.id"), primary_key=True, index=True),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = "genres"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    # returns Genre rows for the given names, creating the ones that don't exist yet
+    @classmethod
+    def from_names(cls, names):
+        existing = cls.query.filter(cls.name.in_(names)).all()
+        existing_names = {genre.name for genre in existing}
+        return existing + [cls(name=name) for name in names if name not in existing_names]
+
+    def __repr__(self):
+        return f"<Genre: {self.name}>"
+
+
 class Venue(db.Model):
     __tablename__ = "venues"
+    __table_args__ = (
+        # /venues lists venues keyset-paginated on (city, state, id)
+        db.Index("ix_venues_city_state_id", "city", "state", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -19,12 +153,21 @@ class Venue(db.Model):
     phone = db.Column(db.String(120), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=venue_genres, order_by="Genre.name", lazy="raise_on_sql"
+    )
     website_link = db.Column(db.String(500))
     searching_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
+    # shows starting after the last counter refresh, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # last change to anything the venue's page shows, see conditional.py
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.now, onupdate=datetime.now)
+    # shows are never loaded implicitly: each query declares how (selectinload,
+    # noload or a column-only projection), any other access raises
     shows = db.relationship(
-        "Show", backref="venues", lazy=False, cascade="all, delete-orphan"
+        "Show", backref="venues", lazy="raise_on_sql", cascade="all, delete-orphan"
     )
 
 
@@ -36,25 +179,228 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=artist_genres, order_by="Genre.name", lazy="raise_on_sql"
+    )
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(500))
     searching_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
+    # shows starting after the last counter refresh, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # last change to anything the artist's page shows, see conditional.py
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.now, onupdate=datetime.now)
+    # shows are never loaded implicitly: each query declares how (selectinload,
+    # noload or a column-only projection), any other access raises
     shows = db.relationship(
-        "Show", backref="artists", lazy=False, cascade="all, delete-orphan"
+        "Show", backref="artists", lazy="raise_on_sql", cascade="all, delete-orphan"
     )
 
 
+# case-insensitive name lookups (lower(name) = lower(:name))
+db.Index("ix_venues_lower_name", db.func.lower(Venue.name))
+db.Index("ix_artists_lower_name", db.func.lower(Artist.name))
+
+
+# Shows last from start_time to end_time. A show is at most MAX_SHOW_DURATION
+# long, so the shows that can overlap a slot all start less than that before
+# it (see schedule.find_conflicts).
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+MAX_SHOW_DURATION = timedelta(hours=12)
+
+
+def _default_end_time(context):
+    start_time = context.get_current_parameters()["start_time"]
+    return start_time + DEFAULT_SHOW_DURATION if start_time else None
+
+
 class Show(db.Model):
     __tablename__ = "shows"
+    __table_args__ = (
+        # /shows is keyset-paginated on (start_time, artist_id, venue_id), the
+        # detail pages and the conflict check read one venue's or one artist's
+        # shows by start_time
+        db.Index("ix_shows_start_time_artist_id_venue_id",
+                 "start_time", "artist_id", "venue_id"),
+        db.Index("ix_shows_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_shows_artist_id_start_time", "artist_id", "start_time"),
+        db.CheckConstraint("end_time > start_time", name="ck_shows_end_after_start"),
+        # on PostgreSQL the b6e3d9f4a2c1 migration also adds exclusion
+        # constraints on (venue_id, [start_time, end_time)) and
+        # (artist_id, [start_time, end_time)), so overlapping bookings are
+        # refused even when they race past the conflict check
+    )
 
+    id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(
-        "artists.id"), primary_key=True)
+        "artists.id"), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey(
-        "venues.id"), primary_key=True)
+        "venues.id"), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, default=_default_end_time)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.now, onupdate=datetime.now)
+
+    # times given as text ("2030-01-01T20:00") are parsed
+    @validates("start_time", "end_time")
+    def validate_time(self, key, value):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
+
+    def __repr__(self):
+        return f"<Show ID: {self.id}>, <Artist ID: {self.artist_id}>, <Venue ID: {self.venue_id}>, <Start Time: {self.start_time}> \n"
+
+
+# The venues and artists whose shows a flush inserted or deleted are updated
+# once per flush, in its transaction: their updated_at is touched (their pages
+# list the shows) and their upcoming_shows_count moves by the upcoming shows
+# added less those removed (see counters.py). That is at most two UPDATEs per
+# model whatever the number of shows. Owners the flush deletes are left out.
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _update_owners(session, flush_context):
+    now = datetime.now()
+    changes = [(instance, 1) for instance in session.new if isinstance(instance, Show)]
+    changes += [(instance, -1) for instance in session.deleted if isinstance(instance, Show)]
+    if not changes:
+        return
+    for model, owner_column in ((Venue, "venue_id"), (Artist, "artist_id")):
+        deleted = {instance.id for instance in session.deleted if isinstance(instance, model)}
+        deltas = {}
+        for show, delta in changes:
+            owner_id = getattr(show, owner_column)
+            if owner_id in deleted:
+                continue
+            upcoming = show.start_time is not None and show.start_time > now
+            deltas[owner_id] = deltas.get(owner_id, 0) + (delta if upcoming else 0)
+        touch(model, sorted(deltas), session)
+        deltas = {owner_id: delta for owner_id, delta in deltas.items() if delta}
+        if deltas:
+            session.execute(
+                model.__table__.update()
+                .where(model.id.in_(sorted(deltas)))
+                .values(upcoming_shows_count=model.upcoming_shows_count
+                        + case(deltas, value=model.id))
+            )
+
+
+# onupdate only fires when a column changes, a venue or artist whose genres
+# alone were edited is touched here
+@event.listens_for(RoutingSession, "before_flush")
+def _touch_edited(session, flush_context, instances):
+    for instance in session.dirty:
+        if isinstance(instance, (Venue, Artist)) and session.is_modified(instance):
+            instance.updated_at = datetime.now()
+
+
+# time of the last deletion from venues, artists or shows, one row per table:
+# a deleted row leaves no updated_at behind for the listing pages to see
+class Deletion(db.Model):
+    __tablename__ = "deletions"
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<Deletion: {self.table_name} ({self.deleted_at})>"
+
+
+# session.deleted still lists the flushed deletions (cascades included) here
+@event.listens_for(RoutingSession, "after_flush")
+def _record_deletions(session, flush_context):
+    tables = {
+        instance.__tablename__ for instance in session.deleted
+        if isinstance(instance, (Venue, Artist, Show))
+    }
+    now = datetime.now()
+    for table_name in sorted(tables):
+        updated = session.execute(
+            Deletion.__table__.update()
+            .where(Deletion.table_name == table_name)
+            .values(deleted_at=now)
+        ).rowcount
+        if not updated:
+            session.execute(
+                Deletion.__table__.insert().values(table_name=table_name, deleted_at=now)
+            )
+
+
+# sets updated_at of the given venues or artists, for writes made with Core
+# (in `session`, the request's session by default)
+def touch(model, ids, session=None):
+    if not ids:
+        return
+    (session or db.session).execute(
+        model.__table__.update().where(model.id.in_(ids)).values(updated_at=datetime.now())
+    )
+
+
+# restricts a query over venues or artists to those playing the given genre,
+# walking the genre_id index of the link table (/venues?genre=Jazz)
+def filter_by_genre(query, model, genre):
+    link = model.genres.property.secondary
+    entity_id = link.c.venue_id if model is Venue else link.c.artist_id
+    return (
+        query.join(link, entity_id == model.id)
+        .join(Genre, Genre.id == link.c.genre_id)
+        .filter(Genre.name == genre)
+    )
+
+
+# genre names of a batch of venues or artists in one query, {id: [names]}
+def genre_names_by_id(model, ids):
+    link = model.genres.property.secondary
+    entity_id = link.c.venue_id if model is Venue else link.c.artist_id
+    rows = (
+        db.session.query(entity_id.label("entity_id"), Genre.name)
+        .join(Genre, Genre.id == link.c.genre_id)
+        .filter(entity_id.in_(ids))
+        .order_by(Genre.name)
+    )
+    names = {}
+    for row in rows:
+        names.setdefault(row.entity_id, []).append(row.name)
+    return names
+
+
+# splits query rows (typically read with yield_per) into lists of up to `size`
+# rows, so each batch is processed and written out in one go (API listings,
+# exports)
+def in_batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# progress of `flask fyyur import`, committed together with each batch so an
+# interrupted import resumes right after the last committed record
+class ImportCheckpoint(db.Model):
+    __tablename__ = "import_checkpoints"
+
+    source = db.Column(db.String, primary_key=True)
+    records_done = db.Column(db.Integer, nullable=False, default=0)
+    finished = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ImportCheckpoint: {self.source} ({self.records_done})>"
+
+
+# time of the last `flask fyyur refresh-counts` of each counted table, so that
+# `flask fyyur check-counts` can tell the shows that started since then apart
+# from counters that really drifted
+class CounterRefresh(db.Model):
+    __tablename__ = "counter_refreshes"
+
+    table_name = db.Column(db.String, primary_key=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
 
     def __repr__(self):
-        return f"<Artist ID: {self.artist_id}>, <Venue ID: {self.venue_id}>, <Start Time: {self.start_time}> \n"
+        return f"<CounterRefresh: {self.table_name} ({self.refreshed_at})>"
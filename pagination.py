@@ -0,0 +1,170 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import DateTime, Integer, Numeric, String, literal, tuple_
+
+# Keyset (cursor) pagination shared by the listing and search pages.
+# A page is fetched with "WHERE (keys) > (cursor) ORDER BY keys LIMIT n", so a
+# deep page costs the same as the first one instead of an ever growing OFFSET.
+# Cursors are the key values of the first/last row of a page, as url-safe base64 JSON.
+
+# rows of a lazy page are fetched from the cursor this many at a time
+LAZY_FETCH_SIZE = 20
+
+# JSON values a cursor may hold, anything else never reaches the query
+CURSOR_SCALARS = (str, int, float, type(None))
+# bounds of a 64-bit integer column
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+class Page:
+    def __init__(self, items, has_next, has_prev, next_url=None, prev_url=None):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_url = next_url
+        self.prev_url = prev_url
+
+
+# This function turns the key values of a row into an opaque cursor string
+
+
+def encode_cursor(values):
+    payload = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# This function decodes a cursor back into typed key values, aborting with a 400
+# when the cursor was tampered with or does not match the keys of the listing
+
+
+def decode_cursor(cursor, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(keys):
+            raise ValueError(cursor)
+        return [_key_value(key, value) for key, value in zip(keys, payload)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def _key_value(key, value):
+    # a scalar of the key column's type: a str for a name, an int for an id
+    if isinstance(value, bool) or not isinstance(value, CURSOR_SCALARS):
+        raise TypeError(value)
+    if value is None:
+        return value
+    if isinstance(key.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(key.type, Integer) and not (
+        isinstance(value, int) and MIN_INTEGER <= value <= MAX_INTEGER
+    ):
+        raise ValueError(value)
+    if isinstance(key.type, Numeric) and not isinstance(value, (int, float)):
+        raise ValueError(value)
+    if isinstance(key.type, String) and not isinstance(value, str):
+        raise ValueError(value)
+    return value
+
+
+# This function reads ?per_page= and clamps it to the configured page-size limits
+
+
+def get_per_page():
+    default = current_app.config["PAGE_SIZE"]
+    maximum = current_app.config["MAX_PAGE_SIZE"]
+    per_page = request.args.get("per_page", default, type=int)
+    return max(1, min(per_page, maximum))
+
+
+def _page_url(cursor, direction, url_args):
+    args = dict(request.view_args or {})
+    args.update(url_args)
+    args.update(cursor=cursor, direction=direction)
+    return url_for(request.endpoint, **args)
+
+
+# This function applies keyset pagination to `query`.
+# `keys` are the columns the listing is ordered by (the last one must make the
+# ordering unique) and must be selected by the query under the same names.
+# The cursor and direction are read from the request; `url_args` are carried
+# over into the next/prev links (e.g. the search term).
+# With `lazy`, page.items is a generator reading rows off the cursor and the
+# links are filled in as it is consumed, for templates that are streamed
+# (the pager comes after the rows).
+
+
+def paginate(query, keys, descending=False, url_args=None, lazy=False):
+    per_page = get_per_page()
+    cursor = request.args.get("cursor")
+    direction = request.args.get("direction", "next")
+    if direction not in ("next", "prev"):
+        abort(400)
+    if url_args is None:
+        url_args = {
+            name: value
+            for name, value in request.args.items()
+            if name not in ("cursor", "direction")
+        }
+    elif "per_page" in request.args:
+        url_args = dict(url_args, per_page=get_per_page())
+
+    backwards = direction == "prev"
+    # walking forward over an ascending listing (or backwards over a
+    # descending one) moves towards larger keys
+    towards_larger = backwards == descending
+    key_tuple = tuple_(*keys)
+    values = None
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        bound = tuple_(*[literal(value, key.type) for key, value in zip(keys, values)])
+        query = query.filter(key_tuple > bound if towards_larger else key_tuple < bound)
+    order = [key.asc() if towards_larger else key.desc() for key in keys]
+
+    query = query.order_by(*order).limit(per_page + 1)
+    if lazy and not backwards:
+        page = Page(None, False, values is not None)
+        page.items = _lazy_items(page, query, keys, per_page, url_args)
+        return page
+
+    # backward pages are read in reverse, so they are always fetched up front
+    rows = query.all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = values is not None, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    page = Page(rows, has_next, has_prev)
+    if rows and has_next:
+        page.next_url = _page_url(_row_cursor(rows[-1], keys), "next", url_args)
+    if rows and has_prev:
+        page.prev_url = _page_url(_row_cursor(rows[0], keys), "prev", url_args)
+    return page
+
+
+def _row_cursor(row, keys):
+    return encode_cursor([getattr(row, key.key) for key in keys])
+
+
+def _lazy_items(page, query, keys, per_page, url_args):
+    last = None
+    for count, row in enumerate(query.yield_per(LAZY_FETCH_SIZE)):
+        if count == per_page:
+            # the extra row only tells that there is a next page
+            page.has_next = True
+            page.next_url = _page_url(_row_cursor(last, keys), "next", url_args)
+            return
+        if count == 0 and page.has_prev:
+            page.prev_url = _page_url(_row_cursor(row, keys), "prev", url_args)
+        last = row
+        yield row
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, g, has_request_context, jsonify, render_template, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from cache import response_cache
+
+# Per-request SQL instrumentation.
+#
+# Engine events record, for every statement run while handling a request, the
+# time it took and its parameterized SQL ("shape"). At the end of the request
+# the totals are sent as a Server-Timing header and kept for the debug-only
+# /debug/perf page. With SQL_STRICT_MAX_DUPLICATES set, running the same shape
+# more than that many times in one request raises RepeatedQueryError (an N+1
+# loop), which makes such regressions fail loudly in tests.
+#
+# Server databases get a TimedQueuePool, which records how long each checkout
+# waited. Together with the pool's own counters this is served on
+# /metrics/pool (POOL_METRICS_ENDPOINT) and shown on /debug/perf. The numbers
+# are per worker process.
+#
+# The recent requests and the strict limit are kept per app, in
+# app.extensions["perf"].
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.shapes = Counter()
+
+    def duplicates(self):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > 1]
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.timeouts += timed_out
+        if has_request_context() and "sql_stats" in g:
+            g.sql_stats.pool_wait += wait
+
+    def snapshot(self, pool):
+        metrics = {
+            "pool": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_total": round(self.wait_time * 1000, 2),
+            "wait_ms_avg": round(self.wait_time * 1000 / max(self.checkouts, 1), 3),
+            "wait_ms_max": round(self.max_wait * 1000, 2),
+        }
+        if isinstance(pool, QueuePool):
+            metrics.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                # negative while the pool has not opened all of its connections
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+            )
+        return metrics
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    # time spent getting a connection: waiting for one to be checked in, or
+    # opening a new one
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def _pool():
+    return current_app.extensions["sqlalchemy"].db.engine.pool
+
+
+class PerfState:
+    # one app's recent requests, for /debug/perf, and its strict limit
+
+    def __init__(self, recent_requests, strict_max_duplicates):
+        self.recent = deque(maxlen=recent_requests)
+        self.strict_max_duplicates = strict_max_duplicates
+
+
+class PerfMonitor:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["perf"] = PerfState(
+            app.config.get("PERF_RECENT_REQUESTS", 100),
+            app.config.get("SQL_STRICT_MAX_DUPLICATES"),
+        )
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if app.debug:
+            app.add_url_rule("/debug/perf", "debug_perf", self._debug_page)
+        if app.config.get("POOL_METRICS_ENDPOINT"):
+            app.add_url_rule("/metrics/pool", "pool_metrics", self._pool_metrics)
+
+    def _start_request(self):
+        g.sql_stats = RequestStats()
+
+    def _finish_request(self, response):
+        stats = g.pop("sql_stats", None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.db_time * 1000
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={db_ms:.2f};desc="{stats.statements} queries", '
+            f"pool;dur={stats.pool_wait * 1000:.2f}, app;dur={total_ms:.2f}",
+        )
+        if request.endpoint not in ("debug_perf", "pool_metrics"):
+            current_app.extensions["perf"].recent.appendleft({
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "status": response.status_code,
+                "statements": stats.statements,
+                "db_ms": round(db_ms, 2),
+                "total_ms": round(total_ms, 2),
+                "duplicates": stats.duplicates(),
+            })
+        return response
+
+    def _debug_page(self):
+        return render_template(
+            "pages/perf.html",
+            requests=list(current_app.extensions["perf"].recent),
+            cache_stats=response_cache.stats() if response_cache.enabled else None,
+            pool_stats=pool_metrics.snapshot(_pool()),
+        )
+
+    def _pool_metrics(self):
+        return jsonify(pool_metrics.snapshot(_pool()))
+
+
+perf_monitor = PerfMonitor()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context so a failing statement leaves nothing behind
+    context._perf_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or "sql_stats" not in g:
+        return
+    stats = g.sql_stats
+    stats.statements += 1
+    stats.db_time += time.perf_counter() - context._perf_started
+    stats.shapes[statement] += 1
+    limit = current_app.extensions["perf"].strict_max_duplicates
+    if limit is not None and stats.shapes[statement] > limit:
+        raise RepeatedQueryError(
+            f"{stats.shapes[statement]} executions of the same query in one request "
+            f"(SQL_STRICT_MAX_DUPLICATES={limit}): {statement}"
+        )
@@ -0,0 +1,124 @@
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+# Read/write routing to a read replica.
+#
+# With a "replica" entry in SQLALCHEMY_BINDS, GET and HEAD requests read from
+# the replica and everything else (and anything flushing) uses the primary.
+# After a request that wrote, the user's reads stay on the primary for
+# READ_YOUR_WRITES_SECONDS, long enough for the replica to catch up, so they
+# see their own changes. When a connection to the replica cannot be opened the
+# session falls back to the primary and the replica is left alone for
+# REPLICA_RETRY_SECONDS.
+#
+# Locally, two SQLite files stand in for the pair:
+#   DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URL=sqlite:////tmp/replica.db
+
+REPLICA_BIND = "replica"
+PRIMARY_UNTIL_KEY = "_read_primary_until"
+# set in the WSGI environ of the requests asgi.py serves on the event loop,
+# their queries go through the async driver of the engine
+ASYNC_IO_KEY = "fyyur.async_io"
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self.down_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, seconds):
+        self.down_until = time.monotonic() + seconds
+
+
+replica_health = ReplicaHealth()
+
+
+def _reads_from_replica():
+    return has_request_context() and g.get("read_from_replica", False)
+
+
+def _async_io():
+    return has_request_context() and request.environ.get(ASYNC_IO_KEY, False)
+
+
+class RoutingSession(SignallingSession):
+    def __init__(self, db, **options):
+        self._db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def _for_request(self, engine):
+        if _async_io():
+            # the sync facade of the AsyncEngine, its round trips are awaited
+            # on the event loop the request runs on
+            return self._db.get_async_engine(engine).sync_engine
+        return engine
+
+    def _replica_engine(self):
+        if REPLICA_BIND not in (self.app.config["SQLALCHEMY_BINDS"] or {}):
+            return None
+        return self._for_request(self._db.get_engine(self.app, bind=REPLICA_BIND))
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and _reads_from_replica() and replica_health.available:
+            replica = self._replica_engine()
+            if replica is not None:
+                return replica
+        return self._for_request(SignallingSession.get_bind(self, mapper, clause))
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except DBAPIError:
+            if engine is not self._replica_engine():
+                raise
+            # the replica is unreachable, this request and the next ones for
+            # a while are served by the primary
+            replica_health.mark_down(self.app.config["REPLICA_RETRY_SECONDS"])
+            g.read_from_replica = False
+            return super()._connection_for_bind(
+                self._for_request(self._db.engine), execution_options, **kw
+            )
+
+
+def _replica_configured():
+    return REPLICA_BIND in (current_app.config["SQLALCHEMY_BINDS"] or {})
+
+
+def _record_write(db_session, flush_context):
+    if has_request_context():
+        g.wrote = True
+
+
+class ReplicaRouter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._route_request)
+        app.after_request(self._remember_write)
+        if not event.contains(RoutingSession, "after_flush", _record_write):
+            event.listen(RoutingSession, "after_flush", _record_write)
+        app.extensions["replica_router"] = self
+
+    def _route_request(self):
+        g.read_from_replica = (
+            request.method in ("GET", "HEAD")
+            and _replica_configured()
+            and time.time() >= session.get(PRIMARY_UNTIL_KEY, 0)
+        )
+
+    def _remember_write(self, response):
+        if g.pop("wrote", False) and _replica_configured():
+            session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config["READ_YOUR_WRITES_SECONDS"]
+        return response
+
+
+replica_router = ReplicaRouter()
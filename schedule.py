@@ -0,0 +1,256 @@
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+
+from flask import abort
+from sqlalchemy import and_, func, or_
+
+from models import db, Artist, Show, Venue, DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
+
+# Show listings narrowed to a time range and a place
+# (/shows?from=&to=&city=&state=&venue_id=, /shows/calendar, /api/v1/shows).
+#
+# The range is a predicate on shows.start_time, so it is read as a range scan
+# of the (start_time, artist_id, venue_id) index, or of (venue_id, start_time)
+# when a venue is given. City and state go through the (city, state, id) venue
+# index to the shows of the matching venues only.
+#
+# `from` and `to` take a date (2026-10-24) or a date and time
+# (2026-10-24T18:00); a `to` date includes the whole day.
+
+CALENDAR_VIEWS = ("week", "month")
+
+
+class ShowFilters:
+    def __init__(self, start=None, end=None, city=None, state=None, venue_id=None):
+        # start_time >= start and start_time < end
+        self.start = start
+        self.end = end
+        self.city = city
+        self.state = state
+        self.venue_id = venue_id
+
+    def place_args(self):
+        # the location filters as query string arguments, for links
+        args = {"city": self.city, "state": self.state, "venue_id": self.venue_id}
+        return {name: value for name, value in args.items() if value is not None}
+
+
+def _parse_time(value, end):
+    try:
+        if "T" in value or " " in value.strip():
+            moment = datetime.fromisoformat(value.strip())
+            return moment + timedelta(microseconds=1) if end else moment
+        day = date.fromisoformat(value.strip())
+    except ValueError:
+        abort(400, description=f"Invalid date: {value}")
+    return datetime.combine(day + timedelta(days=1) if end else day, time())
+
+
+# This function reads the filters from the request arguments, aborting with a
+# 400 on malformed dates or ids
+
+
+def show_filters(args):
+    start = args.get("from")
+    end = args.get("to")
+    venue_id = args.get("venue_id")
+    if venue_id:
+        try:
+            venue_id = int(venue_id)
+        except ValueError:
+            abort(400, description=f"Invalid venue_id: {venue_id}")
+    filters = ShowFilters(
+        start=_parse_time(start, end=False) if start else None,
+        end=_parse_time(end, end=True) if end else None,
+        city=args.get("city") or None,
+        state=args.get("state") or None,
+        venue_id=venue_id or None,
+    )
+    if filters.start and filters.end and filters.start >= filters.end:
+        abort(400, description="from must be before to")
+    return filters
+
+
+# This function applies `filters` to a query over shows, which must already
+# be joined to Venue when a city or state is given
+
+
+def filter_shows(query, filters):
+    if filters.start is not None:
+        query = query.filter(Show.start_time >= filters.start)
+    if filters.end is not None:
+        query = query.filter(Show.start_time < filters.end)
+    if filters.venue_id is not None:
+        query = query.filter(Show.venue_id == filters.venue_id)
+    if filters.city is not None:
+        query = query.filter(Venue.city == filters.city)
+    if filters.state is not None:
+        query = query.filter(Venue.state == filters.state)
+    return query
+
+
+#  Booking conflicts
+#  ----------------------------------------------------------------
+#
+# Two shows overlap when each starts before the other ends. As no show is
+# longer than MAX_SHOW_DURATION, the shows overlapping [start, end) of a venue
+# or an artist start in (start - MAX_SHOW_DURATION, end): a bounded range of
+# the (venue_id, start_time) or (artist_id, start_time) index, whatever the
+# number of shows the venue or artist has. Concurrent bookings that both pass
+# the check are stopped by the exclusion constraints on PostgreSQL; SQLite
+# has a single writer.
+
+# owners per statement of booked_slots, SQLite limits the depth of expressions
+SLOTS_CHUNK_SIZE = 100
+# SQLSTATE exclusion_violation
+EXCLUSION_VIOLATION = "23P01"
+
+
+def show_end_time(start_time, duration=None):
+    # `duration` in minutes, as entered in the show form
+    if duration is None:
+        return start_time + DEFAULT_SHOW_DURATION
+    return start_time + timedelta(minutes=duration)
+
+
+def overlaps(start, end, other_start, other_end):
+    return start < other_end and other_start < end
+
+
+def _overlapping(owner_column, owner_id, start, end):
+    return db.session.query(Show).filter(
+        owner_column == owner_id,
+        Show.start_time > start - MAX_SHOW_DURATION,
+        Show.start_time < end,
+        Show.end_time > start,
+    )
+
+
+def is_booking_conflict(error):
+    # an IntegrityError raised by the PostgreSQL exclusion constraints
+    return getattr(error.orig, "pgcode", None) == EXCLUSION_VIOLATION
+
+
+# This function returns the shows of the venue or the artist that overlap
+# [start, end), earliest first
+
+
+def find_conflicts(venue_id, artist_id, start, end):
+    shows = _overlapping(Show.venue_id, venue_id, start, end).union_all(
+        _overlapping(Show.artist_id, artist_id, start, end)
+    )
+    return sorted(set(shows), key=lambda show: (show.start_time, show.id))
+
+
+# This function yields (owner id, start_time, end_time) for the shows of
+# `owner_column` (Show.venue_id or Show.artist_id) that may overlap the
+# windows, a {owner id: (start, end)} dict, for checking many bookings at once
+
+
+def booked_slots(owner_column, windows):
+    windows = list(windows.items())
+    for index in range(0, len(windows), SLOTS_CHUNK_SIZE):
+        ranges = [
+            and_(owner_column == owner_id,
+                 Show.start_time > start - MAX_SHOW_DURATION,
+                 Show.start_time < end)
+            for owner_id, (start, end) in windows[index:index + SLOTS_CHUNK_SIZE]
+        ]
+        yield from db.session.query(owner_column, Show.start_time, Show.end_time).filter(or_(*ranges))
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+
+class CalendarDay:
+    def __init__(self, day, in_period):
+        self.date = day
+        self.in_period = in_period
+        self.count = 0
+        self.shows = []
+
+
+# This function returns the first and last day (exclusive) of the week or
+# month around `day`, and the first days of the periods before and after it
+
+
+def calendar_period(view, day):
+    if view == "week":
+        first = day - timedelta(days=day.weekday())
+        return first, first + timedelta(days=7), first - timedelta(days=7), first + timedelta(days=7)
+    first = day.replace(day=1)
+    following = (first + timedelta(days=31)).replace(day=1)
+    previous = (first - timedelta(days=1)).replace(day=1)
+    return first, following, previous, following
+
+
+def _as_date(value):
+    # date() gives a date on PostgreSQL and an ISO string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+# This function returns the shows of [first, last) for a calendar, as rows of
+# (day, day_count, start_time, artist_id, venue_id, names...) holding at most
+# `per_day` shows of each day. Days are computed, counted and cut off in the
+# query (window functions partitioned by day), and the artist and venue names
+# are only joined in for the rows that are kept.
+
+
+def calendar_rows(filters, first, last, per_day):
+    day = func.date(Show.start_time)
+    order = (Show.start_time, Show.artist_id, Show.venue_id)
+    query = db.session.query(
+        day.label("day"),
+        func.count().over(partition_by=day).label("day_count"),
+        func.row_number().over(partition_by=day, order_by=order).label("position"),
+        Show.start_time,
+        Show.artist_id,
+        Show.venue_id,
+    ).select_from(Show)
+    if filters.city is not None or filters.state is not None:
+        query = query.join(Venue, Venue.id == Show.venue_id)
+    range_filters = ShowFilters(
+        start=datetime.combine(first, time()),
+        end=datetime.combine(last, time()),
+        city=filters.city,
+        state=filters.state,
+        venue_id=filters.venue_id,
+    )
+    shows = filter_shows(query, range_filters).subquery()
+    return (
+        db.session.query(
+            shows.c.day,
+            shows.c.day_count,
+            shows.c.start_time,
+            shows.c.artist_id,
+            shows.c.venue_id,
+            Venue.name.label("venue_name"),
+            Artist.name.label("artist_name"),
+        )
+        .join(Venue, Venue.id == shows.c.venue_id)
+        .join(Artist, Artist.id == shows.c.artist_id)
+        .filter(shows.c.position <= per_day)
+        .order_by(shows.c.start_time, shows.c.artist_id, shows.c.venue_id)
+        .all()
+    )
+
+
+# This function lays the calendar out in weeks of CalendarDay (Monday first),
+# covering [first, last) plus the days needed to fill the first and last week
+
+
+def calendar_weeks(rows, first, last):
+    grid_start = first - timedelta(days=first.weekday())
+    grid_end = last + timedelta(days=-last.weekday() % 7)
+    days = {}
+    current = grid_start
+    while current < grid_end:
+        days[current] = CalendarDay(current, first <= current < last)
+        current += timedelta(days=1)
+    for day, shows in groupby(rows, key=lambda row: row.day):
+        calendar_day = days[_as_date(day)]
+        calendar_day.shows = list(shows)
+        calendar_day.count = calendar_day.shows[0].day_count
+    ordered = list(days.values())
+    return [ordered[index:index + 7] for index in range(0, len(ordered), 7)]
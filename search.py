@@ -0,0 +1,93 @@
+import re
+
+from sqlalchemy import func, literal, literal_column, or_, select, table, column
+
+from models import db, Genre
+
+# Indexed search over venues and artists (name, city, state and genres).
+#
+# PostgreSQL: each table has a `search_vector` tsvector column with a GIN index,
+# plus a pg_trgm GIN index on name so substring matches on names keep working.
+# Results are ranked by ts_rank + trigram similarity.
+# SQLite: each table has an FTS5 table `<table>_fts` using the trigram
+# tokenizer, ranked by bm25.
+# Both are kept in sync by triggers on the entity and genre association tables,
+# see the a3c1f6e2d9b4 and c7d2e94b1f03 migrations.
+#
+# search_subquery() returns a subquery of (id, rank) where a lower rank is a
+# better match, so results can be keyset-paginated on (rank, id).
+
+# searched alongside the genre names linked to each row
+TEXT_COLUMNS = ("name", "city", "state")
+
+# FTS5's trigram tokenizer cannot match terms shorter than three characters
+MIN_TRIGRAM_LENGTH = 3
+
+
+def search_words(term):
+    return re.findall(r"\w+", term)
+
+
+def _postgresql_subquery(model, term, words):
+    vector = literal_column(f"{model.__tablename__}.search_vector")
+    name_matches = model.name.ilike("%{}%".format(term))
+    similarity = func.similarity(model.name, term)
+    if not words:
+        return select(model.id.label("id"), (-similarity).label("rank")).where(name_matches)
+    tsquery = func.to_tsquery("simple", " & ".join(word + ":*" for word in words))
+    rank = -(func.ts_rank(vector, tsquery) + similarity)
+    return select(model.id.label("id"), rank.label("rank")).where(
+        or_(vector.op("@@")(tsquery), name_matches)
+    )
+
+
+def _sqlite_subquery(model, term, words):
+    indexed_words = [word for word in words if len(word) >= MIN_TRIGRAM_LENGTH]
+    short_words = [word for word in words if len(word) < MIN_TRIGRAM_LENGTH]
+    if not indexed_words:
+        return _fallback_subquery(model, words or [term])
+    fts_name = f"{model.__tablename__}_fts"
+    fts = table(fts_name, column("rowid"), column("rank"))
+    match = " AND ".join('"{}"'.format(word) for word in indexed_words)
+    query = (
+        select(model.id.label("id"), fts.c.rank.label("rank"))
+        .join(fts, fts.c.rowid == model.id)
+        .where(literal_column(fts_name).op("MATCH")(match))
+    )
+    # short words are checked on the rows the index already narrowed down
+    for word in short_words:
+        query = query.where(_matches_any_column(model, word))
+    return query
+
+
+def _matches_any_column(model, word):
+    pattern = "%{}%".format(word)
+    return or_(
+        *[getattr(model, name).ilike(pattern) for name in TEXT_COLUMNS],
+        model.genres.any(Genre.name.ilike(pattern)),
+    )
+
+
+# Unindexed scan, used for very short terms and unknown dialects
+
+
+def _fallback_subquery(model, words):
+    return select(model.id.label("id"), literal(0.0).label("rank")).where(
+        *[_matches_any_column(model, word) for word in words]
+    )
+
+
+def search_subquery(model, term):
+    term = term.strip()
+    if not term:
+        # an empty search lists everything, as the ILIKE '%%' search did
+        return select(model.id.label("id"), literal(0.0).label("rank")).subquery()
+    words = search_words(term)
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        query = _postgresql_subquery(model, term, words)
+    elif dialect == "sqlite":
+        query = _sqlite_subquery(model, term, words)
+    else:
+        query = _fallback_subquery(model, words or [term])
+    return query.subquery()
@@ -0,0 +1,6 @@
+from app import create_app
+
+# WSGI entry point for production servers: gunicorn wsgi:application
+# (gunicorn.conf.py holds the tuned settings and the fork hooks)
+
+application = create_app()